@@ -7,62 +7,45 @@ Last change: 06.03.2021 - Function dictValToSet and mergeSets
                           class Backup, getPureOneBetweenAlphabet(), getPureSuccessor()
              14.03.2021 - Transiton pruning bug repaired. Chnage solver logic from
                           one big OR to more AND as assert-soft.
+             17.10.2026 - statesEQ engine selection (pairwise BFS or partition refinement).
+                          Parallel solving of family clusters in the process pool.
+                          stateSignature - prefilter of pairs in statesEQ.
+                          Phases and events of solverMinimization are measured (stats.py).
+                          minimizeFamily merges all groups at once (Nfa.quotient).
+                          Class Backup replaced by transactions of Nfa.
+                          expansionSize, boundedExpansion - budget of simplifieTransitions.
+                          calculateSolver uses the reusable optimizer (solver.py).
+                          Solver backend selection (brute force, greedy, Z3).
+                          Solutions of isomorphic clusters are cached (clustercache.py).
+                          Time budget and anytime mode of solverMinimization.
+                          statesEQ engine "simulation" (simulation.py).
+                          Class UnionFind, mergeSets and familyClustering use it.
+                          The simulation relations are recomputed once per round.
+                          solverMinimization rolls the transaction back on exceptions.
+                          signatureSteps option of minimizeFamily and solverMinimization.
 """
 
 
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from itertools import combinations
 import nfa
+import partition
+import simulation
 import sys
-from error import warning, printStats, debugMsg, debugPrintAutomaton
-from z3 import Implies, Optimize, Not, Bool, And, Or, is_true
+from error import printStats, debugMsg, debugPrintAutomaton
+from stats import Stats
+import solver
+import clustercache
 import time
 
 
-class Backup():
-    """Class for the backup of a set of states.
-    This class is widely used in family minimization. In the cases, where
-    a minimization returns worst result as a original states layout,
-    the backup will be restored.
+class TimeBudgetExceeded(Exception):
+    """Raises when the time budget of the minimization runs out
+    (and the anytime mode is not used).
     """
-
-    def __init__(self, automaton, states):
-        """Initial function backup given states set of automaton.
-        Transitions, initial and accepting behavior is stored for
-        the futured reuses.
-
-        Args:
-            automaton (Nfa): Automaton, which states are backuped.
-            states (set): The set of states to backup.
-        """
-        self.automaton = automaton
-        self.states = states
-        self.trans = list()
-        # Transitions are backuped in the forward order.
-        for state in states:
-            # Backup of backward transitions.
-            if state in automaton.backwardTrans:
-                for letter in automaton.backwardTrans[state]:
-                    for fromS in automaton.backwardTrans[state][letter]:
-                        self.trans.append((fromS, letter, state))
-            # Backup of forward transitions.
-            if state in automaton.forwardTrans:
-                for letter in automaton.forwardTrans[state]:
-                    for toS in automaton.forwardTrans[state][letter]:
-                        self.trans.append((state, letter, toS))
-        # Backup initial and accepting states
-        self.initial = automaton.initialStates.intersection(states)
-        self.accepting = automaton.acceptingStates.intersection(states)
-
-
-    def restore(self):
-        """Function restore previously backuped states, its behavior and transitions.
-        """
-
-        for fromS, letter, toS in self.trans:
-            self.automaton.addTransition(fromS, toS, letter)
-        self.automaton.initialStates.update(self.initial)
-        self.automaton.acceptingStates.update(self.accepting)
+    pass
 
 
 def dictValToSet(dictionary):
@@ -81,38 +64,102 @@ def dictValToSet(dictionary):
         return values
 
 
-def mergeSets(listOfSets): 
+class UnionFind():
+    """Class of disjoint sets of items (union-find with path halving
+    and union by size). Each item is mapped to the representative of its set.
+    """
+
+    def __init__(self):
+        """Initial function creates the structure without items.
+        """
+        self.parent = dict()
+        self.size = dict()
+
+
+    def add(self, item):
+        """Function adds the item as a singleton set, if it is not present.
+
+        Args:
+            item (object): Hashable item.
+        """
+        if item not in self.parent:
+            self.parent[item] = item
+            self.size[item] = 1
+
+
+    def find(self, item):
+        """Function returns the representative of the set of the item.
+
+        Args:
+            item (object): Item of the structure.
+
+        Returns:
+            object: Representative of the set.
+        """
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+
+    def union(self, first, second):
+        """Function joins the sets of both items. Missing items are added.
+
+        Args:
+            first (object): Item of the first set.
+            second (object): Item of the second set.
+
+        Returns:
+            object: Representative of the joined set.
+        """
+        self.add(first)
+        self.add(second)
+        first = self.find(first)
+        second = self.find(second)
+        if first == second:
+            return first
+        if self.size[first] < self.size[second]:
+            first, second = second, first
+        self.parent[second] = first
+        self.size[first] += self.size[second]
+        return first
+
+
+    def groups(self):
+        """Function returns all sets of the structure.
+
+        Returns:
+            list: List of sets of items.
+        """
+        groups = defaultdict(set)
+        for item in self.parent:
+            groups[self.find(item)].add(item)
+        return list(groups.values())
+
+
+def mergeSets(listOfSets):
     """Function will merge sets in given list with common items.
     Function merges all sets, whitch has some common item.
-    The merge problem is solved as commection problem in graph.
-
-    The function is taken from:
-    https://www.geeksforgeeks.org/python-merge-list-with-common-elements-in-a-list-of-lists/
+    The merge problem is solved by the union-find structure.
 
     Args:
         listOfSets (list): list of sets to merge in dependance of its items.
 
-    Yields:
-        Object generator: Return object generator for list of merged sets
-                          it is required to call list(mergeSets()).
+    Returns:
+        list: List of merged sets.
     """
 
-    neigh = defaultdict(set) 
-    visited = set() 
-    for each in listOfSets: 
-        for item in each: 
-            neigh[item].update(each) 
-    def comp(node, neigh = neigh, visited = visited, vis = visited.add): 
-        nodes = set([node]) 
-        next_node = nodes.pop 
-        while nodes: 
-            node = next_node() 
-            vis(node) 
-            nodes |= neigh[node] - visited 
-            yield node 
-    for node in neigh: 
-        if node not in visited: 
-            yield set(comp(node))
+    unionFind = UnionFind()
+    for each in listOfSets:
+        items = iter(each)
+        first = next(items, None)
+        if first is None:
+            continue
+        unionFind.add(first)
+        for item in items:
+            unionFind.union(first, item)
+    return unionFind.groups()
 
 
 def mergeDicts(dictOfDicts, keysOfDicts):
@@ -139,7 +186,33 @@ def mergeDicts(dictOfDicts, keysOfDicts):
     return mergedDict
 
 
-def statesEQ(automaton, states, st=1):
+def stateSignature(trans, flaggedStates, states, steps=0):
+    """Function calculates the signature of the set of states. Two sets of states
+    with different signatures can not be language equivalent (forward
+    or backward, depending on the transition dictionary). The signature
+    consists of the flag (accepting or initial) and the set of letters.
+    For steps > 0 the signatures of the succesors under each letter are
+    included too.
+
+    Args:
+        trans (dict): Transition dictionary.
+        flaggedStates (set): Accepting (forward) or initial (backward) states.
+        states (set): States whose signature is calculated.
+        steps (int): Optional (default 0). Depth of the signature.
+
+    Returns:
+        tuple: Hashable signature of the states.
+    """
+
+    flag = not flaggedStates.isdisjoint(states)
+    succesorsDict = mergeDicts(trans, states)
+    if steps < 1:
+        return (flag, frozenset(succesorsDict))
+    return (flag, frozenset((letter, stateSignature(trans, flaggedStates, succesorsDict[letter], steps - 1))
+                            for letter in succesorsDict))
+
+
+def statesEQ(automaton, states, st=1, engine="pairwise", signatureSteps=0):
     """Function calculates language equivalency (backward and forward)
     of states set.
 
@@ -148,6 +221,21 @@ def statesEQ(automaton, states, st=1):
         states (set): Set of states to compute equivalecy.
         st (int): Optional arrtibute (default 1). Steps on which the 
                   equivalence is calculated.
+        engine (string): Optional attribute (default "pairwise"). The "pairwise"
+                         engine tests each pair of states with isForwardEQ and
+                         isBackwardEQ. The "refinement" engine computes all classes
+                         at once by the partition refinement (see partition.py).
+                         The "simulation" engine uses the simulation equivalence
+                         of the whole automaton (see simulation.py), the lookahead
+                         is not used.
+        signatureSteps (int): Optional attribute (default 0). Depth of the state
+                              signatures for the pairwise engine. Only states
+                              with the same signature are tested. Equivalent states
+                              have the same signatures of any depth, so a deeper
+                              signature only skips more pairs.
+
+    Raises:
+        BadType: If the engine is unknown.
 
     Returns:
         tuple: Tuple of eqivalent states: tuple(backwardEQ, forwardEQ)
@@ -155,16 +243,36 @@ def statesEQ(automaton, states, st=1):
                set represents equivalent pair. Self equivalence is not
                included.
     """
+    if engine == "refinement":
+        return partition.refinementEQ(automaton, states, steps=st)
+    elif engine == "simulation":
+        return simulation.simulationEQ(automaton, states)
+    elif engine != "pairwise":
+        raise nfa.BadType("Bad equivalence engine {0}".format(engine))
+
     backwardEQ = set()
     forwardEQ = set()
 
-    # Equivalence of each conbination of two states is calculated.
+    # States with different signature can not be equivalent,
+    # so the states are splited into buckets by signatures.
+    forwardBuckets = defaultdict(list)
+    backwardBuckets = defaultdict(list)
+    for state in states:
+        forwardBuckets[stateSignature(automaton.forwardTrans, automaton.acceptingStates,
+                                      {state}, signatureSteps)].append(state)
+        backwardBuckets[stateSignature(automaton.backwardTrans, automaton.initialStates,
+                                       {state}, signatureSteps)].append(state)
+
+    # Equivalence of each conbination of two states in the same bucket is calculated.
     # Combination of two same states is not included.
-    for r, s in combinations(states, 2):
-        if automaton.isForwardEQ(r, s, steps=st):
-            forwardEQ.add(frozenset({r, s}))
-        if automaton.isBackwardEQ(r, s, steps=st):
-            backwardEQ.add(frozenset({r, s}))
+    for bucket in forwardBuckets.values():
+        for r, s in combinations(bucket, 2):
+            if automaton.isForwardEQ(r, s, steps=st):
+                forwardEQ.add(frozenset({r, s}))
+    for bucket in backwardBuckets.values():
+        for r, s in combinations(bucket, 2):
+            if automaton.isBackwardEQ(r, s, steps=st):
+                backwardEQ.add(frozenset({r, s}))
 
     return backwardEQ, forwardEQ
 
@@ -183,19 +291,21 @@ def familyClustering(backwardEq, forwardEq, groupsContent):
               containing backward and forward equivalent states.
     """
 
-    # Create empty 
-    clustersDict = {frozenset(k):{'B':set(), 'F':set()} for k in groupsContent}
+    # Create empty clusters and the index state -> cluster.
+    clustersDict = dict()
+    clusterOf = dict()
+    for key in groupsContent:
+        key = frozenset(key)
+        clustersDict[key] = {'B': set(), 'F': set()}
+        for state in key:
+            clusterOf[state] = key
+
+    for direction, pairs in (('B', backwardEq), ('F', forwardEq)):
+        for pair in pairs:
+            r, s = pair
+            if r in clusterOf:
+                clustersDict[clusterOf[r]][direction].add(frozenset(pair))
 
-    for r, s in backwardEq:
-        for key in groupsContent:
-            if r in key:
-                clustersDict[frozenset(key)]['B'].add(frozenset({r, s}))
-    
-    for r, s in forwardEq:
-        for key in groupsContent:
-            if r in key:
-                clustersDict[frozenset(key)]['F'].add(frozenset({r, s}))
- 
     return clustersDict
 
 
@@ -213,9 +323,9 @@ def softDuplicateState(automaton, state):
 
     newState = automaton.createNewState("tmp")
     if state in automaton.initialStates:
-        automaton.initialStates.add(newState)
+        automaton.addInitialState(newState)
     if state in automaton.acceptingStates:
-        automaton.acceptingStates.add(newState)
+        automaton.addAcceptingState(newState)
     
     return newState
 
@@ -333,81 +443,109 @@ def simplifieTransitions(automaton, states):
     return newStatesSet
 
 
-def calculateSolver(backwardEq, forwardEq):
+def expansionSize(automaton, state):
+    """Function predicts the count of new states created from the state
+    by simplifieTransitions. For each pair of (ancestor, letter) and
+    (letter, succesor) one new state is created. Self loops are not counted.
+
+    Args:
+        automaton (Nfa): Automaton with the state.
+        state (string): Simplified state.
+
+    Returns:
+        int: Count of new states.
+    """
+
+    return max(automaton.inDegree(state), 1) * max(automaton.outDegree(state), 1)
+
+
+def boundedExpansion(automaton, family, budget):
+    """Function selects the states of the family, which will be simplified,
+    so the predicted size of the family after the simplification does not
+    exceed the budget. The states with the smallest expansion are selected first.
+
+    Args:
+        automaton (Nfa): Automaton with the family.
+        family (set): The set of states.
+        budget (int): Maximal predicted count of states of the family.
+
+    Returns:
+        set: States to simplify.
+    """
+
+    selected = set()
+    size = len(family)
+    for state in sorted(family, key=lambda state: (expansionSize(automaton, state), str(state))):
+        expansion = expansionSize(automaton, state)
+        if size - 1 + expansion > budget:
+            break
+        selected.add(state)
+        size += expansion - 1
+    return selected
+
+
+def solverTimeout(deadline):
+    """Function calculates the timeout of one solver call, so the call
+    ends before the deadline.
+
+    Args:
+        deadline (float): Deadline (time.monotonic()) or None.
+
+    Returns:
+        int: Timeout in ms (at most solver.DEFAULT_TIMEOUT)
+             or None, if there is no deadline.
+    """
+
+    if deadline is None:
+        return None
+    return max(1, min(solver.DEFAULT_TIMEOUT, int((deadline - time.monotonic()) * 1000)))
+
+
+def calculateSolver(backwardEq, forwardEq, stats=None, backend="auto", timeout=None):
     """In dependace of backward and forward equivalent states, the function
     calsulates optimal groups of states, which can be merged into one.
-    The optimization is done by Z3 solver.
+    The optimization is done by the solver backend (see solver.py).
 
     Args:
         backwardEq (set): The set of backward equivalent pairs of states.
         forwardEq (set): The set of forward equivalent paris of states.
+        stats (Stats): Optional (default None). Statistics, where the solver
+                       calls and timeouts are counted.
+        backend (string): Optional (default "auto"). Solver backend
+                          (see solver.getBackend).
+        timeout (int): Optional (default None). Timeout of the solver in ms.
 
     Returns:
         list: The list of sets of states, which can be merged into one.
     """
-    # Init Z3 solver (optimizer).
-    opt = Optimize()
-    opt.set("timeout", 60000)
-
-    # Calculate states used in backward and forward language equivalence.
-    backwardStates = frozenset.union(*backwardEq) if backwardEq else set()
-    forwardStates = frozenset.union(*forwardEq) if forwardEq else set()
-
-    # # Create Bool variables for backward and forward equivalence.
-    # # forward = "q1_F", backward = "q1_B"
-    # for v in {Bool("{}_B".format(s)) for s in backwardStates}:
-    #     opt.add_soft(v)
-    # for v in {Bool("{}_F".format(s)) for s in forwardStates}:
-    #     opt.add_soft(v)
-    
-    # Add possibly merged pairs of state into solver as assert.
-    # (q1_B /\ q2_B) stands for backward equivalent states q1 and q2.
-    cnt = 0
-    for backwardPair in {And(Bool("{}_B".format(r)), Bool("{}_B".format(s))) for r, s in backwardEq}:
-        opt.add_soft(backwardPair)
-        cnt += 1
-    for forwardPair in {And(Bool("{}_F".format(r)), Bool("{}_F".format(s))) for r, s in forwardEq}:
-        opt.add_soft(forwardPair)
-        cnt += 1
-    # setOfAnds = {And(Bool("{}_B".format(r)), Bool("{}_B".format(s))) for r, s in backwardEq}
-    # setOfAnds.update({And(Bool("{}_F".format(r)), Bool("{}_F".format(s))) for r, s in forwardEq})
-    # opt.add(Or(setOfAnds))
-
-
-    # Declare merge rules. If the state s is used in merge on the basis of
-    # backward language inslustion, than state s can not be used in forward merge.
-    # Rule = "q1_B => ~q1_F"
-    cnt = 0
-    for state in backwardStates.intersection(forwardStates):
-        opt.add(Implies(Bool("{}_B".format(state)), Not(Bool("{}_F".format(state)))))
-        cnt += 1
-    
-    # # Add possibly merged pairs of state into solver as assert.
-    # # All paris are concatenated by OR. Pair is defined as:
-    # # (q1_B /\ q2_B) stands for backward equivalent states q1 and q2.
-    # setOfAnds = {And(Bool("{}_B".format(r)), Bool("{}_B".format(s))) for r, s in backwardEq}
-    # setOfAnds.update({And(Bool("{}_F".format(r)), Bool("{}_F".format(s))) for r, s in forwardEq})
-    # opt.add(Or(setOfAnds))
-    timeNow = round(time.time() * 1000)
-
-    # Calculate problem
-    opt.check()
-    model = opt.model()
-    # Sets for states merged with some other state in backward or forward.
-    backwardTrue = set()
-    forwardTrue = set()
-
-    # Find all states merged with some other state and marked it.
-    for key in model:
-        if is_true(model[key]):
-            if str(key)[-1] == "B":
-                backwardTrue.add(str(key)[:-2])
-            elif str(key)[-1] == "F":
-                forwardTrue.add(str(key)[:-2])
-            else:
-                warning("calculateSolver()",
-                        "Solver variable: {0} makes no sense.".format(key))
-    
+    # Try to find the solution of an isomorphic cluster in the cache.
+    cache = clustercache.getCache()
+    cached = None
+    if cache is not None:
+        key, order = clustercache.canonicalForm(backwardEq, forwardEq)
+        cached = cache.get(key)
+        if stats is not None:
+            stats.count("cacheHits" if cached is not None else "cacheMisses")
+
+    if cached is not None:
+        # Relabel the cached solution back to the states.
+        backwardTrue = {order[label] for label in cached[0]}
+        forwardTrue = {order[label] for label in cached[1]}
+    else:
+        # Find all states merged with some other state in backward or forward.
+        clusterSolver = solver.getBackend(backwardEq, forwardEq, backend)
+        backwardTrue, forwardTrue, timedOut = clusterSolver.solve(backwardEq, forwardEq, timeout)
+        if stats is not None:
+            stats.count("solverCalls")
+            stats.count("{0}Calls".format(clusterSolver.name))
+            if timedOut:
+                stats.count("solverTimeouts")
+        # Only optimal solutions are cached.
+        if cache is not None and clusterSolver.exact and not timedOut:
+            label = {state: index for index, state in enumerate(order)}
+            cache.put(key, (tuple(sorted(label[state] for state in backwardTrue)),
+                            tuple(sorted(label[state] for state in forwardTrue))))
+
     # Based of the sets backwardTrue and forwardTrue find pairs of state
     # from backwardEq or forwardEq, where both states are marked ad true.
     # This states will be merged.
@@ -423,21 +561,57 @@ def calculateSolver(backwardEq, forwardEq):
     return list(mergeSets(mergablePairs))
 
 
-def minimizeFamily(automaton, family, lookahead):
+def solveCluster(backwardEq, forwardEq, backend="auto", timeout=None):
+    """Function calls calculateSolver with its own statistics.
+    It is used in the worker processes, where the statistics
+    of the main process are not available.
+
+    Args:
+        backwardEq (set): The set of backward equivalent pairs of states.
+        forwardEq (set): The set of forward equivalent paris of states.
+        backend (string): Optional (default "auto"). Solver backend.
+        timeout (int): Optional (default None). Timeout of the solver in ms.
+
+    Returns:
+        tuple: (list of sets of states to merge, statistics as dict)
+    """
+
+    clusterStats = Stats()
+    with clusterStats.phase("calculateSolver"):
+        mergeSuggestion = calculateSolver(backwardEq, forwardEq, clusterStats, backend, timeout)
+    return mergeSuggestion, clusterStats.toDict()
+
+
+def minimizeFamily(automaton, family, lookahead, engine="pairwise", pool=None, stats=None,
+                   backend="auto", deadline=None, signatureSteps=0):
     """Function minimize family of the state depending of their
     forward and backward language equivalence.
 
     Args:
         automaton (Nfa): The automaton of which the minimizaiton is calculated.
         family (set): The set of state which will be possibly merged.
+        lookahead (int): Steps on which the equivalence is calculated.
+        engine (string): Equivalence engine (see statesEQ).
+        pool (Executor): Optional (default None). If given, clusters of the family
+                         are solved in parallel in the pool. The merges are
+                         done serially afterwards.
+        stats (Stats): Optional (default None). Statistics of the minimization.
+        backend (string): Optional (default "auto"). Solver backend.
+        deadline (float): Optional (default None). Deadline (time.monotonic()),
+                          the timeouts of the solver calls are derived from it.
+        signatureSteps (int): Optional (default 0). Depth of the state signatures
+                              (see statesEQ).
 
     Returns:
         bool: Function returns True if the family was merged.
               Otherwise, if the family is at its minimum, returns False.
     """
+    if stats is None:
+        stats = Stats()
     # Calculate backward and forward equivalent pairs in the family.
-    timeNow = round(time.time() * 1000)
-    backwardEq, forwardEq = statesEQ(automaton, family, st=lookahead)
+    with stats.phase("statesEQ"):
+        backwardEq, forwardEq = statesEQ(automaton, family, st=lookahead, engine=engine,
+                                         signatureSteps=signatureSteps)
     # If there is no equivalent pair, the family is at its minimum.
     if not backwardEq and not forwardEq:
         return False
@@ -448,17 +622,33 @@ def minimizeFamily(automaton, family, lookahead):
     # It sped up computation.
     clusters = mergeSets(list(backwardEq.union(forwardEq)))
     splitedFamilyDict = familyClustering(backwardEq, forwardEq, list(clusters))
-    # For each part of a family make calcution and merge.
-    for splitedFamily in splitedFamilyDict:
-        timeNow = round(time.time() * 1000)
-        mergeSuggestion = calculateSolver(splitedFamilyDict[splitedFamily]['B'],
-                                            splitedFamilyDict[splitedFamily]['F'])
-
-        # For each mergable group, do merge, add new state into family and remove
-        # all merged states from group from family.
-        for states in mergeSuggestion:
-            family.add(automaton.mergeStates(states))
-            family.difference_update(states)
+    stats.count("clusters", len(splitedFamilyDict))
+    # Clusters have no effect between each other, so they could be solved in parallel.
+    if pool is not None and len(splitedFamilyDict) > 1:
+        futures = [pool.submit(solveCluster, splitedFamilyDict[splitedFamily]['B'],
+                               splitedFamilyDict[splitedFamily]['F'], backend, solverTimeout(deadline))
+                   for splitedFamily in splitedFamilyDict]
+        mergeSuggestions = list()
+        for future in futures:
+            mergeSuggestion, clusterStats = future.result()
+            stats.merge(clusterStats)
+            mergeSuggestions.append(mergeSuggestion)
+    else:
+        mergeSuggestions = list()
+        for splitedFamily in splitedFamilyDict:
+            with stats.phase("calculateSolver"):
+                mergeSuggestions.append(calculateSolver(splitedFamilyDict[splitedFamily]['B'],
+                                                        splitedFamilyDict[splitedFamily]['F'],
+                                                        stats, backend, solverTimeout(deadline)))
+
+    # Merge all mergable groups of all parts of a family at once, add new states
+    # into family and remove all merged states from family.
+    groups = [states for mergeSuggestion in mergeSuggestions for states in mergeSuggestion]
+    with stats.phase("mergeStates"):
+        family.update(automaton.quotient(groups))
+    for states in groups:
+        family.difference_update(states)
+    stats.count("mergedGroups", len(groups))
 
     # Family is at its minimim, when there was no merged pairs.
     if inputFamily == family:
@@ -467,53 +657,135 @@ def minimizeFamily(automaton, family, lookahead):
     return True
 
 
-def solverMinimization(automaton, lookahead, allowSelfLoops=True):
+def solverMinimization(automaton, lookahead, allowSelfLoops=True, engine="pairwise", workers=1,
+                       stats=None, expansionBudget=None, partialExpansion=False, backend="auto",
+                       timeBudget=None, anytime=False, signatureSteps=0):
     """Function minimize automaton using transition multipliing and
     using Z3 solver for predicting the most optimal merging pairs.
 
     Args:
         automaton (Nfa): Automaton for minimization.
-    """
-    # Init closeSet, which will mark all calculated families.
-    closedSet = set()
-    # While there is unclosed family, do minimalizaciton.
-    while True:
-
-        # Substract from families thous, which has been alredy minimized.
-        # Whe the family is larged than the family in the closedSte, minimize it.        
-        families = automaton.getFamilies(allowSelfLoops=allowSelfLoops).difference(closedSet)
+        lookahead (int): Steps on which the equivalence is calculated.
+        allowSelfLoops (bool): Optional (default True). Allow family states with self loop.
+        engine (string): Optional (default "pairwise"). Equivalence engine (see statesEQ).
+        workers (int): Optional (default 1). Count of processes solving
+                       the family clusters in parallel.
+        stats (Stats): Optional (default None). Statistics, where the durations
+                       of the phases and the counts of the events are added.
+        expansionBudget (int): Optional (default None). Maximal predicted count
+                               of states of a family after simplifieTransitions.
+                               Larger families are skipped (or partially simplified).
+        partialExpansion (bool): Optional (default False). If True, only a part
+                                 of a family over the budget is simplified
+                                 instead of skipping the whole family.
+        backend (string): Optional (default "auto"). Solver backend of the clusters
+                          (see solver.getBackend).
+        timeBudget (float): Optional (default None). Wall-clock budget of the
+                            minimization in seconds. The solver timeouts
+                            are derived from the remaining time.
+        anytime (bool): Optional (default False). If True, the minimization stops
+                        at the end of the budget and the automaton is left in
+                        the best state so far ("budgetExceeded" in statistics).
+        signatureSteps (int): Optional (default 0). Depth of the state signatures
+                              (see statesEQ).
+
+    Raises:
+        TimeBudgetExceeded: If the budget runs out and anytime is False.
+                            The automaton remains in a consistent state.
 
-        # If there is not any suitable family, finish.
-        if not families:
-            break
-
-        # Minimize each family
-        for family in families:
-            # Create backup of the transitions and initial or accepting states.
-            # Backup will be used if the minimization ended with more states than started.
-            backup = Backup(automaton, family)
-            # Create new states with the same language as original family
-            timeNow = round(time.time() * 1000)
-            family = simplifieTransitions(automaton, family)
-            # While the family has equivalent states (can be merged), do minimzation.
-            while True:
-                if not minimizeFamily(automaton, family, lookahead):
-                    # Family can no longer be minimized.
-                    # Test if the resul of a minimization is not worse than the begin
-                    if len(family) > len(backup.states):
-                        backup.restore()
-                        # The first solution was more optimal.
-                        # Restore the backup and the original family.
-                        # Delete new bad (less optimal) solution.
-                        for state in family:
-                            if state not in automaton.states:
-                                continue
-                            automaton.pruneState(state)
-                        family = backup.states
-                    # Mark family's states as closed
-                    closedSet.add(frozenset(family))
+    Returns:
+        Stats: Statistics of the minimization.
+    """
+    if stats is None:
+        stats = Stats()
+    deadline = time.monotonic() + timeBudget if timeBudget is not None else None
+    budgetExceeded = False
+    # Pool of processes for solving of family clusters (used only by more workers).
+    with ProcessPoolExecutor(max_workers=workers, initializer=clustercache.configureCache,
+                             initargs=clustercache.cacheConfig()) if workers > 1 else nullcontext() as pool:
+        # Init closeSet, which will mark all calculated families.
+        closedSet = set()
+        # While there is unclosed family and time, do minimalizaciton.
+        while not budgetExceeded:
+
+            # Substract from families thous, which has been alredy minimized.
+            # Whe the family is larged than the family in the closedSte, minimize it.        
+            # Only families touched by the changes since the last round are rescanned.
+            with stats.phase("getFamilies"):
+                families = automaton.getFamilies(allowSelfLoops=allowSelfLoops,
+                                                 incremental=True).difference(closedSet)
+
+            # If there is not any suitable family, finish.
+            if not families:
+                break
+            # Inside the round the simulation relations are only refined after
+            # each change, the maximal relations are computed once per round.
+            if engine == "simulation":
+                automaton.resetSimulation()
+
+            # Minimize each family
+            for family in families:
+                if deadline is not None and time.monotonic() >= deadline:
+                    budgetExceeded = True
+                    break
+                stats.count("families")
+                # Predict the size of the family after the simplification.
+                expandedStates = family
+                if expansionBudget is not None and \
+                   sum(expansionSize(automaton, state) for state in family) > expansionBudget:
+                    if not partialExpansion:
+                        # The family would be too large, leave it as it is.
+                        stats.count("skippedFamilies")
+                        closedSet.add(frozenset(family))
+                        continue
+                    stats.count("partialFamilies")
+                    expandedStates = boundedExpansion(automaton, family, expansionBudget)
+                # All changes of the family are made in the transaction, which will be
+                # rolled back if the minimization ended with more states than started.
+                # An exception rolls the transaction back too, so the journal is
+                # never left open and the automaton keeps its language.
+                originalFamily = family
+                automaton.beginTransaction()
+                try:
+                    # Create new states with the same language as original family
+                    with stats.phase("simplifieTransitions"):
+                        family = simplifieTransitions(automaton, expandedStates).union(
+                            family.difference(expandedStates))
+                    # While the family has equivalent states (can be merged), do minimzation.
+                    while True:
+                        # At the end of the budget, the family is closed as it is.
+                        if deadline is not None and time.monotonic() >= deadline:
+                            budgetExceeded = True
+                        if budgetExceeded or \
+                           not minimizeFamily(automaton, family, lookahead, engine=engine, pool=pool,
+                                              stats=stats, backend=backend, deadline=deadline,
+                                              signatureSteps=signatureSteps):
+                            break
+                except BaseException:
+                    automaton.rollbackTransaction()
+                    raise
+                # Family can no longer be minimized.
+                # Test if the resul of a minimization is not worse than the begin
+                if len(family) > len(originalFamily):
+                    stats.count("restores")
+                    # The first solution was more optimal.
+                    # Revert all changes and restore the original family.
+                    with stats.phase("restore"):
+                        automaton.rollbackTransaction()
+                    family = originalFamily
+                else:
+                    automaton.commitTransaction()
+                # Mark family's states as closed
+                closedSet.add(frozenset(family))
+                if budgetExceeded:
                     break
 
+    if budgetExceeded:
+        stats.count("budgetExceeded")
+        if not anytime:
+            raise TimeBudgetExceeded("Time budget {0} s of the minimization exceeded".format(timeBudget))
+    return stats
+
 
 def transitionsCount(trans):
     """Statistic function. Returs the count of the atuomaton transtions.
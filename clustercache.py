@@ -0,0 +1,219 @@
+"""clustercache.py
+File with the cache of solved clusters. The key of a cluster is a best-effort
+canonical form of the graph of backward and forward equivalent pairs. Equal keys
+always mean isomorphic clusters, so the solution of one cluster is reused
+(relabelled) for the others. Isomorphic clusters may get different keys, which
+only costs a cache miss.
+Author: Z3-in-NFA-reduction contributors
+Last change: 17.10.2026 - creation, canonicalForm, ClusterCache (LRU in memory, sqlite on disk)
+             17.10.2026 - The cache is disabled by default (opt-in).
+             17.10.2026 - The key is documented as a best-effort canonical form.
+"""
+
+
+from collections import OrderedDict, defaultdict
+import json
+import os
+import sqlite3
+
+
+# Configuration of the caches (see configureCache) and the cache of the current process.
+# The cache is disabled by default.
+_cacheConfig = {"maxSize": 0, "path": None}
+_cache = None
+
+
+def refineColors(states, colors, backwardNeigh, forwardNeigh):
+    """Function refines the colors of the states by the colors of their backward
+    and forward neighbours (color refinement) until the partition is stable.
+    New colors are ranks of sorted signatures, so they do not depend on the
+    names of the states.
+
+    Args:
+        states (list): States of the cluster.
+        colors (dict): Initial color (int) of each state.
+        backwardNeigh (dict): Backward equivalent neighbours of each state.
+        forwardNeigh (dict): Forward equivalent neighbours of each state.
+
+    Returns:
+        dict: Stable color of each state.
+    """
+
+    while True:
+        signatures = {state: (colors[state],
+                              tuple(sorted(colors[n] for n in backwardNeigh[state])),
+                              tuple(sorted(colors[n] for n in forwardNeigh[state])))
+                      for state in states}
+        ranks = {signature: rank for rank, signature in enumerate(sorted(set(signatures.values())))}
+        newColors = {state: ranks[signatures[state]] for state in states}
+        if len(ranks) == len(set(colors.values())):
+            return newColors
+        colors = newColors
+
+
+def canonicalForm(backwardEq, forwardEq):
+    """Function calculates the canonical form of the cluster. The states are
+    ordered by the color refinement. States, which are not distinguished by
+    colors, are individualized one by one (by the name), so isomorphic clusters
+    usually, but not always, get the same form. The same form always means
+    isomorphic clusters.
+
+    Args:
+        backwardEq (set): The set of backward equivalent pairs of states.
+        forwardEq (set): The set of forward equivalent paris of states.
+
+    Returns:
+        tuple: (key, order), where key is hashable canonical form and order
+               is the list of states (the state order[i] has the label i).
+    """
+
+    backwardNeigh = defaultdict(list)
+    forwardNeigh = defaultdict(list)
+    for neigh, pairs in ((backwardNeigh, backwardEq), (forwardNeigh, forwardEq)):
+        for r, s in pairs:
+            neigh[r].append(s)
+            neigh[s].append(r)
+    states = sorted(set(backwardNeigh).union(forwardNeigh), key=str)
+
+    degrees = {state: (len(backwardNeigh[state]), len(forwardNeigh[state])) for state in states}
+    ranks = {degree: rank for rank, degree in enumerate(sorted(set(degrees.values())))}
+    colors = refineColors(states, {state: ranks[degrees[state]] for state in states},
+                          backwardNeigh, forwardNeigh)
+
+    # Individualize the first state of the smallest not distinguished color.
+    while len(set(colors.values())) < len(states):
+        classes = defaultdict(list)
+        for state in states:
+            classes[colors[state]].append(state)
+        color = min(color for color in classes if len(classes[color]) > 1)
+        chosen = classes[color][0]
+        colors = {state: 2 * colors[state] + (state != chosen) for state in states}
+        colors = refineColors(states, colors, backwardNeigh, forwardNeigh)
+
+    order = sorted(states, key=lambda state: colors[state])
+    label = {state: index for index, state in enumerate(order)}
+    key = (len(order),
+           tuple(sorted(tuple(sorted((label[r], label[s]))) for r, s in backwardEq)),
+           tuple(sorted(tuple(sorted((label[r], label[s]))) for r, s in forwardEq)))
+    return key, order
+
+
+class ClusterCache():
+    """Class of the cache of solutions in the canonical form. The cache is
+    in memory with LRU eviction and optionally in the sqlite database on disk
+    (shared by processes and runs).
+    """
+
+    def __init__(self, maxSize=4096, path=None):
+        """Initial function creates empty cache.
+
+        Args:
+            maxSize (int): Optional (default 4096). Maximal count of items in memory.
+            path (string): Optional (default None). Path of the sqlite database.
+        """
+        self.maxSize = maxSize
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # Process, which owns the cache (sqlite connection is not shared).
+        self.pid = os.getpid()
+        self.database = None
+        if path is not None:
+            self.database = sqlite3.connect(path, timeout=60, isolation_level=None)
+            self.database.execute("CREATE TABLE IF NOT EXISTS clusters (key TEXT PRIMARY KEY, value TEXT)")
+
+
+    def get(self, key):
+        """Function returns the cached solution of the canonical form.
+
+        Args:
+            key (tuple): Canonical form.
+
+        Returns:
+            tuple: (labels of backward merged states, labels of forward merged
+                   states) or None if the solution is not in the cache.
+        """
+        if key in self.items:
+            self.items.move_to_end(key)
+            self.hits += 1
+            return self.items[key]
+
+        if self.database is not None:
+            row = self.database.execute("SELECT value FROM clusters WHERE key = ?",
+                                        (json.dumps(key),)).fetchone()
+            if row is not None:
+                value = tuple(tuple(labels) for labels in json.loads(row[0]))
+                self.__remember(key, value)
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+
+    def put(self, key, value):
+        """Function stores the solution of the canonical form.
+
+        Args:
+            key (tuple): Canonical form.
+            value (tuple): (labels of backward merged states,
+                            labels of forward merged states)
+        """
+        self.__remember(key, value)
+        if self.database is not None:
+            self.database.execute("INSERT OR REPLACE INTO clusters VALUES (?, ?)",
+                                  (json.dumps(key), json.dumps(value)))
+
+
+    def __remember(self, key, value):
+        """Function stores the item in memory and evicts the least
+        recently used item, if the cache is full.
+
+        Args:
+            key (tuple): Canonical form.
+            value (tuple): Solution.
+        """
+        self.items[key] = value
+        self.items.move_to_end(key)
+        while len(self.items) > self.maxSize:
+            self.items.popitem(last=False)
+
+
+def configureCache(maxSize=0, path=None):
+    """Function sets the configuration of the caches. The cache of the
+    current process is created again by the next getCache.
+
+    Args:
+        maxSize (int): Optional (default 0). Maximal count of items in memory.
+        path (string): Optional (default None). Path of the sqlite database.
+                       The cache is disabled if there is neither memory nor database.
+    """
+    global _cache
+    _cacheConfig["maxSize"] = maxSize
+    _cacheConfig["path"] = path
+    _cache = None
+
+
+def cacheConfig():
+    """Function returns the configuration of the caches (arguments of
+    configureCache), used for the initialization of worker processes.
+
+    Returns:
+        tuple: (maxSize, path)
+    """
+    return _cacheConfig["maxSize"], _cacheConfig["path"]
+
+
+def getCache():
+    """Function returns the cache of the current process. The cache is
+    created by the first call in each process.
+
+    Returns:
+        ClusterCache: Cache of the process or None if the cache is disabled.
+    """
+    global _cache
+    if _cacheConfig["maxSize"] <= 0 and _cacheConfig["path"] is None:
+        return None
+    if _cache is None or _cache.pid != os.getpid():
+        _cache = ClusterCache(**_cacheConfig)
+    return _cache
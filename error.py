@@ -5,6 +5,8 @@ Author: Michal Šedý
 Last change: 06.03.2021 - warning, error
              07.03.2021 - comments (warning, error)
              14.03.2021 - debugMsg, debugPrintAutomaton, debugPrintbackup
+             17.10.2026 - debugPrintBackup removed (class Backup was replaced
+                          by the transactions of Nfa)
 """
 
 
@@ -66,24 +68,6 @@ def debugPrintAutomaton(automaton):
     # print("="*60, file=sys.stderr)
 
 
-def debugPrintBackup(backup):
-    """Debuging fuction prints content of a backup.
-
-    Args:
-        backup (Backup): Backup to print.
-    """
-    pass
-    # print("="*60, file=sys.stderr)
-    # print("States: {0}".format(backup.states), file=sys.stderr)
-    # print("+"*30, file=sys.stderr)
-    # print("Initiail: {0}".format(backup.initial), file=sys.stderr)
-    # print("+"*30, file=sys.stderr)
-    # print("Accepting: {0}".format(backup.accepting), file=sys.stderr)
-    # print("+"*30, file=sys.stderr)
-    # print("Trans: {0}".format(backup.trans), file=sys.stderr)
-    # print("="*60, file=sys.stderr)
-
-
 def printStats(message):
     """Function print message to stdout.
 
@@ -16,12 +16,34 @@ Last change: 19.02.2021 - creation
                           as: any(var) - False if empty.
              13.03.2021 - getFamilies - family is only set of states with nondeterminism.
              14.03.2021 - Repair bugs in state pruning.
+             17.10.2026 - addInitialState, addAcceptingState
+                          getFamilies - incremental family tracking (dirty states)
+                          isBackwardEQ, isForwardEQ - versioned cache of results
+                          addTransitions - adding transitions in batch
+                          pruneState - iterative cascade of dead states (worklist)
+                          isDeadState - constant time test by maintained degrees
+                          quotient - merge of many groups of states at once
+                          cleanDeadStates - one sweep rebuild of the live part
+                          beginTransaction, commitTransaction, rollbackTransaction
+                          - undo journal of primitive edits
+                          removeInitialState, removeAcceptingState
+                          inDegree, outDegree
+                          simulationClasses - cached simulation equivalence
+                          getFamilies - one pass with union-find, linear distant filter
+                          isBackwardEQ, isForwardEQ - optional int bit sets of states
+                          simulationClasses - refinement of the kept relation, resetSimulation
+                          addTransitions - new states are journaled before their transitions
+                          isBackwardEQ, isForwardEQ - cache of results is LRU (eqCacheSize)
+                          __lookaheadEQBits - ids of removed states are dropped by re-interning
+                          quotient - self loops of the merged groups documented
+                          bitsetIdCount
 """
 
 
 from error import error, warning, printStats
-from collections import deque
+from collections import OrderedDict, defaultdict, deque
 import algorithms
+import simulation
 
 
 class BadType(Exception):
@@ -36,6 +58,13 @@ class NameCollision(Exception):
     pass
 
 
+class TransactionError(Exception):
+    """Raises when the transaction is begun twice or commited (rolled back)
+    without beginning.
+    """
+    pass
+
+
 class Nfa:
     """Class of Nondeterministic Finite Automaton
     Automaton consits of: states, initial states, accepting states
@@ -51,6 +80,46 @@ class Nfa:
         self.__tmpCnt = 0
         self.__initStateCnt = 0
         self.__finalStateCnt = 0
+        # Incremental family tracking. States with changed transitions since
+        # the last incremental getFamilies and cached families of each center
+        # state (forward and backward) with the index member -> centers.
+        self.__dirtyStates = set()
+        self.__centerFamilies = {"F": dict(), "B": dict()}
+        self.__familyIndex = defaultdict(set)
+        # Cache of isForwardEQ and isBackwardEQ results. Each state has
+        # a version, which is changed by each change of its transitions.
+        # The cached result is valid only if all the states used in
+        # the calculation have the same version. The cache is LRU with
+        # at most eqCacheSize results (0 disables the cache).
+        self.__clock = 0
+        self.__stateVersions = dict()
+        self.__eqCache = OrderedDict()
+        self.eqCacheSize = 65536
+        self.eqCacheHits = 0
+        self.eqCacheMisses = 0
+        # If True, the lookahead equivalence uses sets of states as int bit sets
+        # over interned ids of states. Letter masks of the successors of each
+        # state are cached with the version of the state, masks of the flagged
+        # states with the clock. When the removed states make more than
+        # a half of the ids, all states are interned again.
+        self.bitsetEQ = False
+        self.__stateIds = dict()
+        self.__idStates = list()
+        self.__letterMasks = {"F": dict(), "B": dict()}
+        self.__flagMasks = {"F": (None, 0), "B": (None, 0)}
+        # Count of transitions to (in) and from (out) each state,
+        # self loops are not counted. Used by isDeadState.
+        self.__inDegree = defaultdict(int)
+        self.__outDegree = defaultdict(int)
+        # Undo journal of the open transaction (None if there is no transaction).
+        self.__journal = None
+        # Backward and forward simulation relations (simulation.Simulation)
+        # and the states changed since their last update (tracked only
+        # while the relations exist).
+        self.__simulations = None
+        self.__simulationTouched = set()
+        self.simulationComputations = 0
+        self.simulationUpdates = 0
 
 
     def getAlphabet(self):
@@ -175,6 +244,152 @@ class Nfa:
             print("[{0}]".format(s))
 
 
+    def touchState(self, state):
+        """Function marks the state as changed. The state will be rescaned
+        by incremental getFamilies and cached equivalences of the state
+        will be invalid.
+
+        Args:
+            state (string): changed state
+        """
+        self.__dirtyStates.add(state)
+        self.__clock += 1
+        self.__stateVersions[state] = self.__clock
+        if self.__simulations is not None:
+            self.__simulationTouched.add(state)
+
+
+    def __record(self, *edit):
+        """Function writes the primitive edit into the journal
+        of the open transaction.
+
+        Args:
+            edit (tuple): Type of the edit and its arguments.
+        """
+        if self.__journal is not None:
+            self.__journal.append(edit)
+
+
+    def beginTransaction(self):
+        """Function begins the transaction. All following changes of states,
+        initial and accepting states and transitions are written into
+        the journal and can be reverted by rollbackTransaction.
+
+        Raises:
+            TransactionError: If a transaction is already open.
+        """
+        if self.__journal is not None:
+            raise TransactionError("The transaction is already open.")
+        self.__journal = list()
+
+
+    def commitTransaction(self):
+        """Function confirms all changes of the open transaction.
+
+        Raises:
+            TransactionError: If there is no open transaction.
+        """
+        if self.__journal is None:
+            raise TransactionError("There is no open transaction to commit.")
+        self.__journal = None
+
+
+    def rollbackTransaction(self):
+        """Function reverts all changes of the open transaction
+        in the reverse order. The time is proportional to the count
+        of changes.
+
+        Raises:
+            TransactionError: If there is no open transaction.
+        """
+        if self.__journal is None:
+            raise TransactionError("There is no open transaction to roll back.")
+        journal = self.__journal
+        # Reverting edits are not recorded.
+        self.__journal = None
+
+        for edit in reversed(journal):
+            kind = edit[0]
+            if kind == "addTransition":
+                self.pruneTransition(*edit[1:])
+            elif kind == "pruneTransition":
+                self.addTransition(*edit[1:])
+            elif kind == "addState":
+                self.states.discard(edit[1])
+                self.__outDegree.pop(edit[1], None)
+                self.__inDegree.pop(edit[1], None)
+                self.touchState(edit[1])
+            elif kind == "removeState":
+                self.states.add(edit[1])
+                self.touchState(edit[1])
+            elif kind == "addInitial":
+                self.removeInitialState(edit[1])
+            elif kind == "removeInitial":
+                self.addInitialState(edit[1])
+            elif kind == "addAccepting":
+                self.removeAcceptingState(edit[1])
+            elif kind == "removeAccepting":
+                self.addAcceptingState(edit[1])
+
+
+    def addInitialState(self, state):
+        """Function marks the state as initial.
+        The state will be added into the set of automaton states.
+
+        Args:
+            state (string): new initial state
+        """
+        if state not in self.states:
+            self.__record("addState", state)
+            self.states.add(state)
+        if state not in self.initialStates:
+            self.__record("addInitial", state)
+            self.initialStates.add(state)
+        self.touchState(state)
+
+
+    def removeInitialState(self, state):
+        """Function removes the initial mark of the state.
+        The state remains in the automaton.
+
+        Args:
+            state (string): state which will not be initial
+        """
+        if state in self.initialStates:
+            self.__record("removeInitial", state)
+            self.initialStates.remove(state)
+            self.touchState(state)
+
+
+    def addAcceptingState(self, state):
+        """Function marks the state as accepting.
+        The state will be added into the set of automaton states.
+
+        Args:
+            state (string): new accepting state
+        """
+        if state not in self.states:
+            self.__record("addState", state)
+            self.states.add(state)
+        if state not in self.acceptingStates:
+            self.__record("addAccepting", state)
+            self.acceptingStates.add(state)
+        self.touchState(state)
+
+
+    def removeAcceptingState(self, state):
+        """Function removes the accepting mark of the state.
+        The state remains in the automaton.
+
+        Args:
+            state (string): state which will not be accepting
+        """
+        if state in self.acceptingStates:
+            self.__record("removeAccepting", state)
+            self.acceptingStates.remove(state)
+            self.touchState(state)
+
+
     def addTransition(self, fromState, toState, byLetter):
         """Function add new forward transtion (fromState)----byLetter--->(toState).
 
@@ -188,9 +403,12 @@ class Nfa:
         """
 
         # Add states to automaton set of states, for sure.
-        # states is a set, so adding of allready existing item has no effect.
-        self.states.add(fromState)
-        self.states.add(toState)
+        for state in (fromState, toState):
+            if state not in self.states:
+                self.__record("addState", state)
+                self.states.add(state)
+        self.touchState(fromState)
+        self.touchState(toState)
 
         # Set FORWARD TRANSITION
         # Check if allready exists some transition from "fromState".
@@ -199,6 +417,12 @@ class Nfa:
         # Check if fromState allready has some transition with "byLetter".
         if byLetter not in self.forwardTrans[fromState]:
             self.forwardTrans[fromState][byLetter] = set()     
+        if toState not in self.forwardTrans[fromState][byLetter]:
+            self.__record("addTransition", fromState, toState, byLetter)
+            # Count a new transition, which is not a self loop.
+            if fromState != toState:
+                self.__outDegree[fromState] += 1
+                self.__inDegree[toState] += 1
         # Create transition
         self.forwardTrans[fromState][byLetter].add(toState)
 
@@ -213,6 +437,62 @@ class Nfa:
         self.backwardTrans[toState][byLetter].add(fromState)
 
 
+    def addTransitions(self, transitions):
+        """Function add all transitions from the iterable of triples
+        (fromState, toState, byLetter) in one batch. The result is the same
+        as of calling addTransition for each triple.
+
+        Args:
+            transitions (iterable): triples (fromState, toState, byLetter)
+        """
+
+        forwardTrans = self.forwardTrans
+        backwardTrans = self.backwardTrans
+        inDegree = self.__inDegree
+        outDegree = self.__outDegree
+        journal = self.__journal
+        states = self.states
+        touched = set()
+        for fromState, toState, byLetter in transitions:
+            # Add the states first, so the rollback removes them
+            # only after their transitions.
+            for state in (fromState, toState):
+                if state not in states:
+                    if journal is not None:
+                        journal.append(("addState", state))
+                    states.add(state)
+
+            # Set FORWARD TRANSITION
+            letters = forwardTrans.get(fromState)
+            if letters is None:
+                letters = forwardTrans[fromState] = dict()
+            targets = letters.get(byLetter)
+            if targets is None:
+                targets = letters[byLetter] = set()
+            if toState not in targets:
+                if journal is not None:
+                    journal.append(("addTransition", fromState, toState, byLetter))
+                if fromState != toState:
+                    outDegree[fromState] += 1
+                    inDegree[toState] += 1
+            targets.add(toState)
+
+            # Set BACKWARD TRANSITION
+            letters = backwardTrans.get(toState)
+            if letters is None:
+                letters = backwardTrans[toState] = dict()
+            targets = letters.get(byLetter)
+            if targets is None:
+                targets = letters[byLetter] = set()
+            targets.add(fromState)
+
+            touched.add(fromState)
+            touched.add(toState)
+
+        for state in touched:
+            self.touchState(state)
+
+
     def pruneTransition(self, fromState, toState, byLetter):
         """Function will prune the transition between
         "fromState" and "toState" which is marked with "byLetter".
@@ -228,9 +508,16 @@ class Nfa:
             byLetter (string): state to which the transtion leads
         """
 
+        self.touchState(fromState)
+        self.touchState(toState)
+
         # Prune forward transition
         try:
             self.forwardTrans[fromState][byLetter].remove(toState)
+            self.__record("pruneTransition", fromState, toState, byLetter)
+            if fromState != toState:
+                self.__outDegree[fromState] -= 1
+                self.__inDegree[toState] -= 1
             # If the set is empty the key byLetter will be removed from
             # a dictionary of transitons form "fromState".
             if not self.forwardTrans[fromState][byLetter]:
@@ -269,6 +556,32 @@ class Nfa:
                 raise e
 
 
+    def inDegree(self, state):
+        """Function returns the count of transitions leading to the state
+        (pairs of predecesor and letter). Self loops are not counted.
+
+        Args:
+            state (string): state
+
+        Returns:
+            int: in-degree of the state
+        """
+        return self.__inDegree.get(state, 0)
+
+
+    def outDegree(self, state):
+        """Function returns the count of transitions leading from the state
+        (pairs of letter and succesor). Self loops are not counted.
+
+        Args:
+            state (string): state
+
+        Returns:
+            int: out-degree of the state
+        """
+        return self.__outDegree.get(state, 0)
+
+
     def isDeadState(self, state):
         """Function will test, if the state is dead.
 
@@ -285,35 +598,17 @@ class Nfa:
                     "The asked state ({0}) does not exists in an automaton.".format(state))
 
         # Test Forward Dead (no road to accepting state)
-        if state not in self.forwardTrans or not self.forwardTrans[state]:
-            # state does not have succesor
-            if state not in self.acceptingStates:
-                # If the state does not have succesor and is not accepting,
-                # than is dead.
-                return True
-        else:
-            # Test if there is not only self loop.
-            if not algorithms.dictValToSet(self.forwardTrans[state]).difference({state}):
-                # There is only self loop.
-                # Test if is at least accepting state
-                if state not in self.acceptingStates:
-                    return True
+        # The state does not have succesor (self loops are not counted)
+        # and is not accepting.
+        if not self.__outDegree.get(state, 0) and state not in self.acceptingStates:
+            return True
 
         # Test Backward Dead (no road to initial state)
-        if state not in self.backwardTrans or not self.backwardTrans[state]:
-            # State does not have predecesor.
-            if state not in self.initialStates:
-                # If the state does not have predecesor and is not initial,
-                # than is dead.
-                return True
-        else:
-            # Test if there is not only self loop.
-            if not algorithms.dictValToSet(self.backwardTrans[state]).difference({state}):
-                # There is only self loop.
-                # Test if is at least initial state.
-                if state not in self.initialStates:
-                    return True
-        
+        # The state does not have predecesor (self loops are not counted)
+        # and is not initial.
+        if not self.__inDegree.get(state, 0) and state not in self.initialStates:
+            return True
+
         # Otherwise is live, not dead.
         return False
 
@@ -333,19 +628,24 @@ class Nfa:
                     "The deleted state ({0}) does not exists in an automaton.".format(state))
 
         if state in self.states:
+            self.__record("removeState", state)
             self.states.remove(state)
-        if state in self.initialStates:
-            self.initialStates.remove(state)
-        if state in self.acceptingStates:
-            self.acceptingStates.remove(state)
+            self.touchState(state)
+        self.removeInitialState(state)
+        self.removeAcceptingState(state)
         if state in self.forwardTrans:
             del self.forwardTrans[state]
         if state in self.backwardTrans:
             del self.backwardTrans[state]
+        self.__outDegree.pop(state, None)
+        self.__inDegree.pop(state, None)
 
     
     def pruneState(self, state):
         """Function will prune state and its transtions (to and from).
+        Neighbours, which become dead after the prunning, are pruned too.
+        The cascade is done by a worklist (not recursively), so long dead
+        chains are pruned in linear time without a deep recursion.
 
         Args:
             state (string): state to prune
@@ -354,35 +654,51 @@ class Nfa:
         if state not in self.states:
             warning("pruneState()",
                     "The pruned state ({0}) no longer exists".format(state))
-        
-        # Prune FORWARD TRANSITIONS
-        # Check if state has forward transitions
-        if state in self.forwardTrans:
-            for byL in list(self.forwardTrans[state].keys()):
-                if state in self.forwardTrans and byL in self.forwardTrans[state]:
+
+        self.__pruneStates([state])
+
+
+    def __pruneStates(self, states):
+        """Function prunes the states and all states, which become dead
+        by the prunning (worklist cascade).
+
+        Args:
+            states (iterable): states to prune
+        """
+
+        worklist = deque(states)
+        queued = set(worklist)
+        while worklist:
+            state = worklist.popleft()
+
+            # Prune FORWARD TRANSITIONS
+            # Check if state has forward transitions
+            if state in self.forwardTrans:
+                for byL in list(self.forwardTrans[state].keys()):
                     for toS in list(self.forwardTrans[state][byL]):
                         # Prune [state]---byL--->(toS)
                         self.pruneTransition(state, toS, byL)
                         # Check if toS is not dead state after prunning.
-                        # If yes, remove it.
-                        if self.isDeadState(toS) and toS != state:
-                            self.pruneState(toS)
+                        # If yes, add it into the worklist.
+                        if toS not in queued and self.isDeadState(toS):
+                            queued.add(toS)
+                            worklist.append(toS)
 
-        # Prune BACKWARD TRANSITIONS
-        # Check if state has backward transitions
-        if state in self.backwardTrans:
-            for byL in list(self.backwardTrans[state].keys()):
-                if state in self.backwardTrans and byL in self.backwardTrans[state]:
+            # Prune BACKWARD TRANSITIONS
+            # Check if state has backward transitions
+            if state in self.backwardTrans:
+                for byL in list(self.backwardTrans[state].keys()):
                     for toS in list(self.backwardTrans[state][byL]):
                         # Prune (toS)---byL--->[state]
                         self.pruneTransition(toS, state, byL)
                         # Check if toS (predecesor) is not dead state after prunning.
-                        # If, yes, remove it.
-                        if self.isDeadState(toS) and toS != state:
-                            self.pruneState(toS)
-        
-        # Prune (remove) state itself.
-        self.removeState(state)
+                        # If, yes, add it into the worklist.
+                        if toS not in queued and self.isDeadState(toS):
+                            queued.add(toS)
+                            worklist.append(toS)
+
+            # Prune (remove) state itself.
+            self.removeState(state)
 
 
     def createNewState(self, type):
@@ -426,6 +742,7 @@ class Nfa:
             raise NameCollision("Name of state {0} allready exists".format(newState))
         
         # Add state only into the set of automaton states.
+        self.__record("addState", newState)
         self.states.add(newState)
 
         return newState
@@ -448,6 +765,7 @@ class Nfa:
 
         # Create new state (result state)
         newState = self.createNewState("merge")
+        self.touchState(newState)
 
         # Duplicate transitions
         for state in states:
@@ -466,12 +784,12 @@ class Nfa:
         # If some of the merged state is accepting,
         # than the new state will be acceptin too.
         if states.intersection(self.acceptingStates):
-            self.acceptingStates.add(newState)
+            self.addAcceptingState(newState)
         
         # If some of the merged state is initial,
         # than the new state will be initial too.
         if states.intersection(self.initialStates):
-            self.initialStates.add(newState)
+            self.addInitialState(newState)
         
         # Prune (delete) all states.
         # The new (better) state allready exists.
@@ -481,6 +799,81 @@ class Nfa:
         return newState
 
 
+    def quotient(self, partition):
+        """Function merges each group of states of the partition into one (new)
+        state at once. Only the transitions incident to the merged states are
+        redirected, transitions between the states of one group become self
+        loops of the new state. States, which become dead, are pruned in one
+        cascade at the end. Contrary to calling mergeStates for each group,
+        the transitions are rebuilt only once.
+
+        The result is the same as of mergeStates for each group. There the self
+        loops arise too, because the transitions of the later merged states
+        are copied together with the already redirected ones (q -a-> new copied
+        from p -a-> q gives new -a-> new). The quotient keeps the language,
+        if the states of each group have the same forward (or each group
+        the same backward) language.
+
+        Args:
+            partition (list): list of disjoint sets of states, groups with
+                              only one state are not changed
+
+        Returns:
+            list: Names of the new states in the order of the groups (the state
+                  itself for the group with one state).
+        """
+
+        # Representative (new state) of each merged state.
+        representative = dict()
+        newStates = list()
+        for group in partition:
+            if len(group) < 2:
+                newStates.extend(group)
+                continue
+            newState = self.createNewState("merge")
+            self.touchState(newState)
+            newStates.append(newState)
+            for state in group:
+                representative[state] = newState
+            # If some of the merged state is accepting (initial),
+            # than the new state will be accepting (initial) too.
+            if not self.acceptingStates.isdisjoint(group):
+                self.addAcceptingState(newState)
+            if not self.initialStates.isdisjoint(group):
+                self.addInitialState(newState)
+
+        # Collect transitions incident to the merged states, their
+        # redirected copies and the not merged neighbours.
+        oldTransitions = set()
+        for state in representative:
+            if state in self.forwardTrans:
+                for byL in self.forwardTrans[state]:
+                    for toS in self.forwardTrans[state][byL]:
+                        oldTransitions.add((state, toS, byL))
+            if state in self.backwardTrans:
+                for byL in self.backwardTrans[state]:
+                    for fromS in self.backwardTrans[state][byL]:
+                        oldTransitions.add((fromS, state, byL))
+        newTransitions = {(representative.get(fromS, fromS), representative.get(toS, toS), byL)
+                          for fromS, toS, byL in oldTransitions}
+        neighbours = {state for fromS, toS, _ in oldTransitions for state in (fromS, toS)
+                      if state not in representative}
+
+        # Replace the transitions and remove the merged states.
+        for fromS, toS, byL in oldTransitions:
+            self.pruneTransition(fromS, toS, byL)
+        for state in representative:
+            self.removeState(state)
+        self.addTransitions(newTransitions)
+
+        # Prune all states, which become dead.
+        candidates = neighbours.union(newStates)
+        self.__pruneStates([state for state in candidates
+                            if state in self.states and self.isDeadState(state)])
+
+        return newStates
+
+
     def mergeTwoStates(self, first, second):
         """Auxiliary function for mergini only two states.
 
@@ -515,9 +908,8 @@ class Nfa:
             return
         
         # Create new central initial state
+        # (added into automaton, but not makred it as initial yet).
         newInitS = self.createNewState("init")
-        # Add new state into automaton, but not makred it as initial yet.
-        self.states.add(newInitS)
 
         # For each transtion from existing initial states make transition
         # from new initial state (newInitS).
@@ -532,13 +924,15 @@ class Nfa:
         # Test if some of existing initial state is accepting too.
         if self.initialStates.intersection(self.acceptingStates):
             # If yes, than the newly created ctral initila state must be accepting.
-            self.acceptingStates.add(newInitS) 
+            self.addAcceptingState(newInitS)
         
         # Backup old initial states
-        oldInitialStates = self.initialStates
+        oldInitialStates = set(self.initialStates)
 
         # Replace all initial states with newInitS
-        self.initialStates = {newInitS}
+        for oldInitial in oldInitialStates:
+            self.removeInitialState(oldInitial)
+        self.addInitialState(newInitS)
 
         # Test if old initial state are not dead now.
         # If yes, prune it.
@@ -562,7 +956,6 @@ class Nfa:
             return
 
         newFinalS = self.createNewState("final")
-        self.states.add(newFinalS)
 
         # For each transtion to existing final states make transition
         # to new final state (newFinalS).
@@ -581,10 +974,12 @@ class Nfa:
         #     self.initialStates.add(newFinalS) 
         
         # Backup old initial states
-        oldFinalStates = self.acceptingStates
+        oldFinalStates = set(self.acceptingStates)
 
         # Replace all initial states with newInitS + the states that are initial and final
-        self.acceptingStates = {newFinalS}.union(self.initialStates.intersection(oldFinalStates))
+        for oldFinal in oldFinalStates.difference(self.initialStates):
+            self.removeAcceptingState(oldFinal)
+        self.addAcceptingState(newFinalS)
 
         if self.isDeadState(newFinalS):
             self.pruneState(newFinalS)
@@ -596,7 +991,7 @@ class Nfa:
                 self.pruneState(oldFinal)
 
 
-    def getFamilies(self, allowSelfLoops=True):
+    def getFamilies(self, allowSelfLoops=True, incremental=False):
         """Function will return the list of famili sets.
         Family set is a set of state, which are connected througth
         the ancestor of succesor with the some same letter.
@@ -614,76 +1009,177 @@ class Nfa:
         ***-->(q6)---f--->[f2.1]---a--->(q7)--***>  } FAMILY 2
                                 |--a,b->(q8)--***>  } (f2.1)
 
+        Args:
+            allowSelfLoops (bool): Optional (default True). If False, family states
+                                   with self loop are excluded.
+            incremental (bool): Optional (default False). If True, only families
+                                touched by states changed since the last incremental
+                                call are rescanned and returned. Families which were not
+                                touched were allready returned by some previous call.
+
         Returns:
             list: Function returns list of sets of states in famili ralation.
         """
 
-        # List of families. Each family is set of members.
-        families = set()
-
-        # Find families with common ancestor (use FORWARD transitions)
-        # with some same letters.
-        for fromS in self.forwardTrans:
-            succesors = set()
-            for letter in self.forwardTrans[fromS]:
-                possibleSucc = self.forwardTrans[fromS][letter].difference({fromS})
-                # if possibleSucc:
-                #     possibleSucc.difference_update(*(algorithms.getPureSuccesors(self.forwardTrans, states) for states in possibleSucc))
-                # There must be nondeterminism, but self loop does not count.
-                if len(possibleSucc) > 1:
-                    succesors.update(possibleSucc)
-            # If similar succesors of center state exists, mark them as family.
-            if succesors:
-                families.add(frozenset(succesors))
-        
-        # Find families with common ancestor (use BACKWARD transitions)
-        # with some same letters.
-        for fromS in self.backwardTrans:
-            ancestor = set()
-            for letter in self.backwardTrans[fromS]:
-                possibleAnc = self.backwardTrans[fromS][letter].difference({fromS})
-                # if possibleAnc:
-                #     possibleAnc.difference_update(set.union(*(algorithms.getPureSuccesors(self.backwardTrans, states) for states in possibleAnc)))
-                # There must be nondeterminism, but self loop does not count.
-                if len(possibleAnc) > 1:
-                    ancestor.update(frozenset(possibleAnc))
-            # if the similar ancestors of center state exists, mark them as family.
-            if ancestor:
-                families.add(frozenset(ancestor))
-
-        if not allowSelfLoops:
-            # If the self loop ober family state is forbined,
-            # remove this states from family
-            familiesToCheck = families
-            families = set()
-            for family in familiesToCheck:
-                # Create new family withou self loops
-                newFamily = set()
+        if incremental:
+            return self.__getDirtyFamilies(allowSelfLoops)
+
+        # Families of all center states (FORWARD and BACKWARD transitions) are
+        # streamed into the union-find, so the families with common states are merged
+        # (distant families). States with self loop are skipped, if forbiden.
+        unionFind = algorithms.UnionFind()
+        for trans in (self.forwardTrans, self.backwardTrans):
+            for center in trans:
+                family = self.__centerFamily(trans, center)
+                if not allowSelfLoops:
+                    family = [state for state in family if not self.__hasSelfLoop(state)]
+                # The family has to have at least two members.
+                if len(family) < 2:
+                    continue
+                first = next(iter(family))
+                unionFind.add(first)
                 for state in family:
-                    if state in self.forwardTrans:
-                        # If the state does not have self loop add it to the new family
-                        if state not in algorithms.dictValToSet(self.forwardTrans[state]):
-                            newFamily.add(state)
-                # If the family has only one ore non member, dont marked it
-                if len(newFamily) > 1:
-                    families.add(frozenset(newFamily))
-
-        # Merge families with common states. These families are distant families.
-        way = 0 # STATS
+                    unionFind.union(first, state)
+
         newFamilies = set()
-        for family in {frozenset(family) for family in algorithms.mergeSets(families)}:
-            newFamily = set()
-            for state in family:
-                if not (algorithms.getPureSuccesors(self.backwardTrans, state).union(algorithms.getPureSuccesors(self.forwardTrans, state))).intersection(newFamily):
-                    newFamily.add(state)
-                else:
-                    way += 1    # STATS
+        for family in unionFind.groups():
+            newFamily = self.__distantFamily(family)
             if len(newFamily) > 1:
                 newFamilies.add(frozenset(newFamily))
         
         return newFamilies
 
 
+    def __hasSelfLoop(self, state):
+        """Function tests if the state has self loop. States without
+        outgoing transitions are treated as states with self loop (they
+        are not family members, if the self loops are forbiden).
+
+        Args:
+            state (string): Tested state.
+
+        Returns:
+            bool: True if the state has self loop or no outgoing transitions.
+        """
+
+        if state not in self.forwardTrans:
+            return True
+        return any(state in targets for targets in self.forwardTrans[state].values())
+
+
+    def __distantFamily(self, family):
+        """Function selects family states, which are not neighbours of each other.
+        The neighbours of the selected states are blocked, so each state
+        is tested in constant time.
+
+        Args:
+            family (set): Merged family.
+
+        Returns:
+            set: Family states without neighbours.
+        """
+
+        newFamily = set()
+        blocked = set()
+        for state in family:
+            if state not in blocked:
+                newFamily.add(state)
+                for trans in (self.backwardTrans, self.forwardTrans):
+                    if state in trans:
+                        for targets in trans[state].values():
+                            blocked.update(targets)
+        return newFamily
+
+
+    def __centerFamily(self, trans, center):
+        """Function returns the family of one center state. That is the set of
+        the succesors (ancestors for backward transitions) of the center, which
+        are reached by at least two different states with the same letter.
+        Self loops do not count.
+
+        Args:
+            trans (dict): Transition dictionary.
+            center (string): Center state.
+
+        Returns:
+            frozenset: Family of the center. Empty if there is no nondeterminism.
+        """
+
+        members = set()
+        if center in trans:
+            for letter in trans[center]:
+                possibleMembers = trans[center][letter].difference({center})
+                if len(possibleMembers) > 1:
+                    members.update(possibleMembers)
+        return frozenset(members)
+
+
+    def __getDirtyFamilies(self, allowSelfLoops):
+        """Incremental variant of getFamilies. Families of the center states
+        are cached. Only the centers changed since the last call are rescanned
+        and only the merged families containing changed states are returned.
+
+        Args:
+            allowSelfLoops (bool): If False, family states with self loop are excluded.
+
+        Returns:
+            set: Set of families (frozensets) touched by the changes.
+        """
+
+        dirtyStates = self.__dirtyStates
+        self.__dirtyStates = set()
+        touched = set(dirtyStates)
+
+        # Rescan families of the changed center states.
+        for center in dirtyStates:
+            for direction, trans in (("F", self.forwardTrans), ("B", self.backwardTrans)):
+                cache = self.__centerFamilies[direction]
+                oldFamily = cache.pop(center, None)
+                if oldFamily is not None:
+                    touched.update(oldFamily)
+                    for state in oldFamily:
+                        self.__familyIndex[state].discard((direction, center))
+                newFamily = self.__centerFamily(trans, center) if center in self.states else None
+                if newFamily:
+                    cache[center] = newFamily
+                    touched.update(newFamily)
+                    for state in newFamily:
+                        self.__familyIndex[state].add((direction, center))
+
+        def filtered(family):
+            # Remove the states with self loop, if the self loops are forbiden.
+            if allowSelfLoops:
+                return family
+            family = {state for state in family if not self.__hasSelfLoop(state)}
+            return family if len(family) > 1 else set()
+
+        # Merge families with common states, but only those reached from touched states.
+        visited = set()
+        newFamilies = set()
+        for start in touched:
+            if start in visited:
+                continue
+            merged = set()
+            stack = [start]
+            visited.add(start)
+            while stack:
+                state = stack.pop()
+                for direction, center in self.__familyIndex.get(state, ()):
+                    family = filtered(self.__centerFamilies[direction][center])
+                    if state not in family:
+                        continue
+                    merged.update(family)
+                    for member in family:
+                        if member not in visited:
+                            visited.add(member)
+                            stack.append(member)
+            newFamily = self.__distantFamily(merged)
+            if len(newFamily) > 1:
+                newFamilies.add(frozenset(newFamily))
+
+        return newFamilies
+
+
     def isBackwardEQ(self, r, s, steps=1):
         """Function test if two states r and s are in backward language equivalenc.
         Two states are backward equivalent if all backward routs ended in the same
@@ -706,62 +1202,7 @@ class Nfa:
                   "The parameter steps must be positiv number. Given value: steps = {0}".format(steps))
             raise ArithmeticError
 
-        # Initial open and close lists (queue, set, visitedStates).
-        openItems = deque()
-        closeItems = set()
-        visitedStates = set()
-
-        makedSteps = 0
-        # Open will be a queue of lists(next step) of tuples (corresponding pair)
-        # of frozensets (states from r or s).
-        openItems.append([(frozenset({r}), frozenset({s}))])
-
-        while any(openItems):
-            itemsInStep = openItems.popleft()
-            closeItems.update(itemsInStep)
-            toBeAppended = list()
-            for rStates, sStates in itemsInStep:
-                # If two sets of states (rStates and sStates) are
-                # equal, than they are language equivalent.
-                if rStates == sStates:
-                    continue
-
-                # If one state from some set belongs into initial states,
-                # than there must exists state in the other set, wthich
-                # belong into initial states too.
-                if self.initialStates.intersection(rStates):
-                    if not self.initialStates.intersection(sStates):
-                        return False
-                elif self.initialStates.intersection(sStates):
-                    if not self.initialStates.intersection(rStates):
-                        return False
-
-                rAncestorsDict = algorithms.mergeDicts(self.backwardTrans, rStates)
-                sAncestorsDict = algorithms.mergeDicts(self.backwardTrans, sStates)
-                # If this two groups does not lead to its ancestors with the same set
-                # of letters, than they are not equivalent.
-                if set(rAncestorsDict).symmetric_difference(set(sAncestorsDict)):
-                    return False
-                
-                # Generate new tuples of set of states to which leads transition
-                # with same symbol.
-                for key in rAncestorsDict:
-                    # After the maximum step count is reached, only allready visited states
-                    # can be marked as ancestors.
-                    if makedSteps >= steps:
-                        if rAncestorsDict[key].difference(visitedStates) or sAncestorsDict[key].difference(visitedStates):
-                            return False
-                    # If the tuble is not in closeItems, it will be added.
-                    tmp = (frozenset(rAncestorsDict[key]), frozenset(sAncestorsDict[key]))
-                    if not tmp in closeItems:
-                        toBeAppended.append(tmp)
-                    visitedStates.update(rAncestorsDict[key])
-                    visitedStates.update(sAncestorsDict[key])
-            
-            openItems.append(toBeAppended)
-            makedSteps += 1
-        
-        return True
+        return self.__cachedEQ(r, s, steps, "B")
 
     def isForwardEQ(self, r, s, steps=1):
         """Function test if two states r and s are in forward language equivalence.
@@ -785,6 +1226,122 @@ class Nfa:
                   "The parameter steps must be positiv number. Given value: steps = {0}".format(steps))
             raise ArithmeticError
 
+        return self.__cachedEQ(r, s, steps, "F")
+
+
+    def __cachedEQ(self, r, s, steps, direction):
+        """Function returns the cached result of the equivalence test,
+        if all states used in the calculation were not changed since. Otherwise
+        the equivalence is calculated and cached.
+
+        Args:
+            r (string): First state.
+            s (string): Second state.
+            steps (int): Length of the route.
+            direction (string): "F" for forward, "B" for backward equivalence.
+
+        Returns:
+            bool: True if states r and s are equivalent. Otherwise False.
+        """
+
+        key = (r, s, direction, steps)
+        versions = self.__stateVersions
+        if key in self.__eqCache:
+            result, usedStates = self.__eqCache[key]
+            if all(versions.get(state, 0) == version for state, version in usedStates):
+                self.__eqCache.move_to_end(key)
+                self.eqCacheHits += 1
+                return result
+        self.eqCacheMisses += 1
+
+        if self.bitsetEQ:
+            result, visitedStates = self.__lookaheadEQBits(r, s, steps, direction)
+        elif direction == "F":
+            result, visitedStates = self.__lookaheadEQ(r, s, steps, self.forwardTrans, self.acceptingStates)
+        else:
+            result, visitedStates = self.__lookaheadEQ(r, s, steps, self.backwardTrans, self.initialStates)
+        if self.eqCacheSize <= 0:
+            return result
+        visitedStates.update((r, s))
+        self.__eqCache[key] = (result, tuple((state, versions.get(state, 0)) for state in visitedStates))
+        self.__eqCache.move_to_end(key)
+        # Results of removed or long unused states are evicted first.
+        while len(self.__eqCache) > self.eqCacheSize:
+            self.__eqCache.popitem(last=False)
+        return result
+
+
+    def simulationClasses(self):
+        """Function returns the classes of backward and forward simulation
+        equivalence of all states. The relations are computed once and then
+        only refined after the changes of the automaton (see simulation.Simulation),
+        so the classes are sound, but after changes they may be finer than
+        the classes of the maximal relations. resetSimulation drops the relations.
+
+        Returns:
+            tuple: (backward classes, forward classes), dicts state -> class.
+        """
+
+        if self.__simulations is None:
+            self.__simulations = (simulation.Simulation(), simulation.Simulation())
+            self.__simulations[0].compute(self.backwardTrans, self.forwardTrans,
+                                          self.initialStates, self.states)
+            self.__simulations[1].compute(self.forwardTrans, self.backwardTrans,
+                                          self.acceptingStates, self.states)
+            self.simulationComputations += 1
+        elif self.__simulationTouched:
+            self.__simulations[0].update(self.backwardTrans, self.forwardTrans,
+                                         self.initialStates, self.states,
+                                         self.__simulationTouched)
+            self.__simulations[1].update(self.forwardTrans, self.backwardTrans,
+                                         self.acceptingStates, self.states,
+                                         self.__simulationTouched)
+            self.simulationUpdates += 1
+        self.__simulationTouched = set()
+        return tuple(relation.classes() for relation in self.__simulations)
+
+
+    def resetSimulation(self):
+        """Function drops the kept simulation relations, the next call
+        of simulationClasses computes the maximal relations again.
+        """
+        self.__simulations = None
+        self.__simulationTouched = set()
+
+
+    def clearEqCache(self):
+        """Function removes all cached results of isForwardEQ and isBackwardEQ.
+        """
+        self.__eqCache = OrderedDict()
+
+
+    def bitsetIdCount(self):
+        """Function returns the count of the interned ids of the bit sets
+        (see bitsetEQ). The ids of removed states are counted until the states
+        are interned again.
+
+        Returns:
+            int: Count of the interned ids.
+        """
+        return len(self.__idStates)
+
+
+    def __lookaheadEQ(self, r, s, steps, trans, flaggedStates):
+        """Function test if two states r and s are in the language equivalence
+        given by the transition dictionary (forward or backward).
+
+        Args:
+            r (string): First state.
+            s (string): Second state.
+            steps (int): Length of the route.
+            trans (dict): Forward or backward transition dictionary.
+            flaggedStates (set): Accepting states for the forward and initial states
+                                 for the backward equivalence.
+
+        Returns:
+            tuple: (bool, set) The result and the set of visited states.
+        """
+
         # Initial open and close lists (queue, set, visitedStates).
         openItems = deque()
         closeItems = set()
@@ -805,22 +1362,22 @@ class Nfa:
                 if rStates == sStates:
                     continue
 
-                # If one state from some set belongs into accepting states,
+                # If one state from some set belongs into accepting (initial) states,
                 # than there must exists state in the other set, wthich
-                # belong into accepting states too.
-                if self.acceptingStates.intersection(rStates):
-                    if not self.acceptingStates.intersection(sStates):
-                        return False
-                elif self.acceptingStates.intersection(sStates):
-                    if not self.acceptingStates.intersection(rStates):
-                        return False
-
-                rSuccesorsDict = algorithms.mergeDicts(self.forwardTrans, rStates)
-                sSuccesorsDict = algorithms.mergeDicts(self.forwardTrans, sStates)
+                # belong into accepting (initial) states too.
+                if flaggedStates.intersection(rStates):
+                    if not flaggedStates.intersection(sStates):
+                        return False, visitedStates
+                elif flaggedStates.intersection(sStates):
+                    if not flaggedStates.intersection(rStates):
+                        return False, visitedStates
+
+                rSuccesorsDict = algorithms.mergeDicts(trans, rStates)
+                sSuccesorsDict = algorithms.mergeDicts(trans, sStates)
                 # If this two groups does not lead to its succesors with the same set
                 # of letters, than they are not equivalent.
                 if set(rSuccesorsDict).symmetric_difference(set(sSuccesorsDict)):
-                    return False
+                    return False, visitedStates
                 
                 # Generate new tuples of set of states to which leads transition
                 # with same symbol.
@@ -829,7 +1386,7 @@ class Nfa:
                     # can be marked as succesors.
                     if makedSteps >= steps:
                         if rSuccesorsDict[key].difference(visitedStates) or sSuccesorsDict[key].difference(visitedStates):
-                            return False
+                            return False, visitedStates
                     # If the tuple is not in closeItems, it will be added.
                     tmp = (frozenset(rSuccesorsDict[key]), frozenset(sSuccesorsDict[key]))
                     if not tmp in closeItems:
@@ -840,11 +1397,157 @@ class Nfa:
             openItems.append(toBeAppended)
             makedSteps += 1
         
-        return True
+        return True, visitedStates
 
     
+    def __stateId(self, state):
+        """Function returns the interned id (bit index) of the state.
+        Missing states are interned.
+
+        Args:
+            state (string): State.
+
+        Returns:
+            int: Id of the state.
+        """
+
+        stateId = self.__stateIds.get(state)
+        if stateId is None:
+            stateId = self.__stateIds[state] = len(self.__idStates)
+            self.__idStates.append(state)
+        return stateId
+
+
+    def __compactIds(self):
+        """Function drops the interned ids and the cached bit sets, if most
+        of the ids belong to removed states. The states are interned again
+        on demand, so the bit sets do not grow with all states ever created.
+        """
+
+        if len(self.__idStates) > 2 * len(self.states) + 64:
+            self.__stateIds = dict()
+            self.__idStates = list()
+            self.__letterMasks = {"F": dict(), "B": dict()}
+            self.__flagMasks = {"F": (None, 0), "B": (None, 0)}
+
+
+    def __stateLetterMasks(self, state, direction):
+        """Function returns the successors (ancestors for backward direction)
+        of the state by letters as bit sets. The result is cached until the state
+        is changed.
+
+        Args:
+            state (string): State.
+            direction (string): "F" for forward, "B" for backward transitions.
+
+        Returns:
+            dict: letter -> bit set of successors.
+        """
+
+        version = self.__stateVersions.get(state, 0)
+        cached = self.__letterMasks[direction].get(state)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        trans = self.forwardTrans if direction == "F" else self.backwardTrans
+        masks = dict()
+        for letter, targets in trans.get(state, dict()).items():
+            mask = 0
+            for target in targets:
+                mask |= 1 << self.__stateId(target)
+            masks[letter] = mask
+        self.__letterMasks[direction][state] = (version, masks)
+        return masks
+
+
+    def __lookaheadEQBits(self, r, s, steps, direction):
+        """Function test if two states r and s are in the language equivalence
+        in the same way as __lookaheadEQ, but the sets of states are int bit sets.
+
+        Args:
+            r (string): First state.
+            s (string): Second state.
+            steps (int): Length of the route.
+            direction (string): "F" for forward, "B" for backward equivalence.
+
+        Returns:
+            tuple: (bool, set) The result and the set of visited states.
+        """
+
+        self.__compactIds()
+        # Bit set of the accepting (initial) states, cached by the clock.
+        clock, flagMask = self.__flagMasks[direction]
+        if clock != self.__clock:
+            flagMask = 0
+            for state in (self.acceptingStates if direction == "F" else self.initialStates):
+                flagMask |= 1 << self.__stateId(state)
+            self.__flagMasks[direction] = (self.__clock, flagMask)
+
+        idStates = self.__idStates
+
+        def successors(mask):
+            # Merged letter masks of all states of the bit set.
+            merged = dict()
+            while mask:
+                low = mask & -mask
+                mask ^= low
+                for letter, letterMask in self.__stateLetterMasks(idStates[low.bit_length() - 1],
+                                                                  direction).items():
+                    merged[letter] = merged.get(letter, 0) | letterMask
+            return merged
+
+        def states(mask):
+            # Names of the states of the bit set.
+            result = set()
+            while mask:
+                low = mask & -mask
+                mask ^= low
+                result.add(idStates[low.bit_length() - 1])
+            return result
+
+        openItems = deque()
+        closeItems = set()
+        visitedMask = 0
+        makedSteps = 0
+        openItems.append([(1 << self.__stateId(r), 1 << self.__stateId(s))])
+
+        while any(openItems):
+            itemsInStep = openItems.popleft()
+            closeItems.update(itemsInStep)
+            toBeAppended = list()
+            for rMask, sMask in itemsInStep:
+                if rMask == sMask:
+                    continue
+                # Both sets have a flagged state or none of them.
+                if bool(rMask & flagMask) != bool(sMask & flagMask):
+                    return False, states(visitedMask)
+
+                rSuccesorsDict = successors(rMask)
+                sSuccesorsDict = successors(sMask)
+                if rSuccesorsDict.keys() != sSuccesorsDict.keys():
+                    return False, states(visitedMask)
+
+                for key in rSuccesorsDict:
+                    pair = (rSuccesorsDict[key], sSuccesorsDict[key])
+                    # After the maximum step count is reached, only allready visited states
+                    # can be marked as succesors.
+                    if makedSteps >= steps and (pair[0] | pair[1]) & ~visitedMask:
+                        return False, states(visitedMask)
+                    if pair not in closeItems:
+                        toBeAppended.append(pair)
+                    visitedMask |= pair[0] | pair[1]
+
+            openItems.append(toBeAppended)
+            makedSteps += 1
+
+        return True, states(visitedMask)
+
+
     def cleanDeadStates(self):
-        beforeSTATS = len(self.states) # STATS
+        """Function removes all useless states (not reachable from an initial
+        state or not reaching an accepting state) in one sweep. Only the rows of
+        the transition dictionaries incident to the useless states are changed,
+        no cascade of pruneState is needed.
+        """
         openSet = set(self.initialStates)
         reachableFromInit = set()
         while openSet:
@@ -866,11 +1569,41 @@ class Nfa:
             if state in self.backwardTrans:
                 for letter in self.backwardTrans[state]:
                     openSet.update(self.backwardTrans[state][letter])
-        
-        # print("ReachablefromInit", reachableFromInit)
-        # print("ReachablefromFin", reachableFromFin)
 
-        for state in self.states.difference(reachableFromInit.intersection(reachableFromFin)):
-        # for state in reachableFromFin.symmetric_difference(reachableFromInit):
-            if state in self.states:
-                self.pruneState(state)
+        liveStates = reachableFromInit.intersection(reachableFromFin)
+        deadStates = self.states.difference(liveStates)
+        if not deadStates:
+            return
+
+        # In the open transaction, the states are pruned one by one,
+        # so all edits are written into the journal.
+        if self.__journal is not None:
+            for state in deadStates:
+                if state in self.states:
+                    self.pruneState(state)
+            return
+
+        # Rows of the dead states are dropped, dead states are removed from
+        # the rows of their live neighbours (with their degrees).
+        changedStates = set(deadStates)
+        for trans, oppositeTrans, oppositeDegree in ((self.forwardTrans, self.backwardTrans, self.__inDegree),
+                                                     (self.backwardTrans, self.forwardTrans, self.__outDegree)):
+            for state in deadStates:
+                for letter, neighbours in trans.pop(state, dict()).items():
+                    for neighbour in neighbours:
+                        if neighbour in liveStates:
+                            neighbourRow = oppositeTrans[neighbour]
+                            neighbourRow[letter].discard(state)
+                            if not neighbourRow[letter]:
+                                del neighbourRow[letter]
+                            oppositeDegree[neighbour] -= 1
+                            changedStates.add(neighbour)
+        self.states.intersection_update(liveStates)
+        self.initialStates.intersection_update(liveStates)
+        self.acceptingStates.intersection_update(liveStates)
+
+        for state in deadStates:
+            self.__outDegree.pop(state, None)
+            self.__inDegree.pop(state, None)
+        for state in changedStates:
+            self.touchState(state)
@@ -8,21 +8,67 @@ Last change: 20.02.2021 - creation
              08.03.2021 - The parsing bug repaired. REMEMBER: re.search returns group.
                           Index 0 belong to input string, first matched result is
                           on the intex 1.
+             17.10.2026 - addInitialState, addAcceptingState
+             17.10.2026 - The whole file is read at once and tokenized by precompiled
+                          patterns. Transitions are added in batch.
 
 """
 
 import nfa
 import re
+import time
 
 
-def parseTimbuk(fileName):
+# Patterns are matched against the whole file (multiline mode). Trailing white
+# spaces of a line are allowed, as the line was stripped on the right.
+TIMBUK_INITIAL = re.compile(r"^\w+(?:\(\))?[ ]*\->[ ]*(\w+)[^\S\n]*$", re.MULTILINE)
+TIMBUK_TRANSITION = re.compile(r"^(\w+)\((\w+)\)[ ]*\->[ ]*(\w+)[^\S\n]*$", re.MULTILINE)
+TIMBUK_FINAL = re.compile(r"^[^\S\n]*Final(?:[^\S\n].*)?$", re.MULTILINE)
+BA_STATE = re.compile(r"^\[(\w+)\][^\S\n]*$", re.MULTILINE)
+BA_TRANSITION = re.compile(r"^(\w+)[ ]*\,[ ]*\[(\w+)\][ ]*\->[ ]*\[(\w+)\][^\S\n]*$", re.MULTILINE)
+
+
+def readFile(fileName):
+    """Function reads the whole file at once.
+
+    Args:
+        fileName (string): name of the file
+
+    Returns:
+        string: content of the file
+    """
+
+    with open(fileName, 'r') as fh:
+        return fh.read()
+
+
+def parsingStats(stats, data, startTime):
+    """Function fills the parsing statistics (count of lines, duration
+    and lines per second) into the given dictionary.
+
+    Args:
+        stats (dict): Dictionary for statistics or None.
+        data (string): Parsed content.
+        startTime (float): time.perf_counter() at the start of parsing.
+    """
+
+    if stats is None:
+        return
+    duration = time.perf_counter() - startTime
+    lines = data.count("\n") + (1 if data and not data.endswith("\n") else 0)
+    stats["lines"] = lines
+    stats["seconds"] = duration
+    stats["linesPerSecond"] = lines / duration if duration > 0 else float(lines)
+
+
+def parseTimbuk(fileName, stats=None):
     """Function for parsing the automaton in Timbuk format.
 
     Timbuk format:
     Ops a0:1 a1:1 x:0
     Automaton A
-    States q0 q1 q2 q3 
-    Final States q3 
+    States q0 q1 q2 q3
+    Final States q3
     Transitions
     x -> q0
     a0(q0) -> q1
@@ -31,57 +77,41 @@ def parseTimbuk(fileName):
     a1(q2) -> q3
 
     Args:
-        fileName (string): name of the file with the automaton 
+        fileName (string): name of the file with the automaton
                            Timbuk format to parse
+        stats (dict): Optional (default None). Dictionary which is filled
+                      with the count of lines, duration and lines per second.
 
     Returns:
         automaton: parsed automaton
     """
 
-    fh = open(fileName, 'r')
+    startTime = time.perf_counter()
+    data = readFile(fileName)
     automaton = nfa.Nfa()
 
-    # Parse all file line by line.
-    while True:
-        # Read next line and check if exists.
-        line = fh.readline()
-        if not line:
-            break
-        
-        # Delete white space on the right.
-        # The deletion can not be done above, because the empty line
-        # would cause end of parsing. (It should looks as the end of a file.)
-        line = line.rstrip()
-        
-        if re.fullmatch(r"\w+(\(\))?[ ]*\->[ ]*\w+", line) is not None:
-            # Finding initial state "x -> q0"
-            newState = re.search(r"\w+(\(\))?[ ]*\->[ ]*(\w+)", line).group(2)
-            automaton.initialStates.add(newState)
-            automaton.states.add(newState)
-
-        elif re.fullmatch(r"\w+\(\w+\)[ ]*\->[ ]*\w+", line) is not None:
-            # Finding transition "a(q0) -> q1"
-            result = re.search(r"(\w+)\((\w+)\)[ ]*\->[ ]*(\w+)", line)
-            # Create new transition (add new states if not exists yet, in function).
-            automaton.addTransition(result.group(2), result.group(3), result.group(1))
-        
-        else:
-            # It is not transition. Check for final (accepting) states.        
-            # Split line by space and check if it is not empty line.
-            words = line.split()
-            if not words:
-                continue
-   
-            # Find "Final States f1 f2 ..."
-            if words[0] == "Final": 
-                automaton.acceptingStates.update(words[2:])
-                automaton.states.update(words[2:])
-    
-    fh.close()
+    # Finding initial states "x -> q0"
+    for newState in TIMBUK_INITIAL.findall(data):
+        automaton.addInitialState(newState)
+
+    # Finding transitions "a(q0) -> q1"
+    # Create new transitions (add new states if not exists yet, in function).
+    automaton.addTransitions((fromS, toS, byL) for byL, fromS, toS in TIMBUK_TRANSITION.findall(data))
+
+    # Find "Final States f1 f2 ..."
+    for match in TIMBUK_FINAL.finditer(data):
+        line = match.group()
+        # Line such as "Final -> q0" is an initial state.
+        if TIMBUK_INITIAL.fullmatch(line) or TIMBUK_TRANSITION.fullmatch(line):
+            continue
+        for newState in line.split()[2:]:
+            automaton.addAcceptingState(newState)
+
+    parsingStats(stats, data, startTime)
     return automaton
-        
 
-def parseBa(fileName):
+
+def parseBa(fileName, stats=None):
     """Function for parsing the automaton in Ba format.
 
     Ba format:
@@ -96,44 +126,33 @@ def parseBa(fileName):
 
     Args:
         fileName (string): name of the file with the automaton to parse
+        stats (dict): Optional (default None). Dictionary which is filled
+                      with the count of lines, duration and lines per second.
 
     Returns:
         automaton: parsed automaton
     """
 
-    fh = open(fileName, 'r')
+    startTime = time.perf_counter()
+    data = readFile(fileName)
     automaton = nfa.Nfa()
+
     # Besause the format of initial states and final states are equal,
-    # we create a variable for dedecting the end of the sequece of inital states.
-    wasEndOfInitalStates = False
-
-    while True:
-         # Read next line and check if exists.
-        line = fh.readline()
-        if not line:
-            break
-        # Delete white space on the right.
-        # The deletion can not be done above, because the empty line
-        # would cause end of parsing. (It should looks as the end of a file.)
-        line = line.rstrip()
-
-        if re.fullmatch(r"\[\w+\]", line) is not None:
-            # We found initial or accepting state "[q0]"
-            newState = re.search(r"\[(\w+)\]", line).group(1)
-            if wasEndOfInitalStates:
-                automaton.acceptingStates.add(newState)
-            else:
-                automaton.initialStates.add(newState)
-            automaton.states.add(newState)
-        
-        elif re.fullmatch(r"\w+[ ]*\,[ ]*\[\w+\][ ]*\->[ ]*\[\w+\]", line) is not None:
-            # We found transition in the format "a,[q0]->[q1]".
-            result = re.search(r"(\w+)[ ]*\,[ ]*\[(\w+)\][ ]*\->[ ]*\[(\w+)\]", line)
-            # Create new transition (add new states if not exists yet).
-            automaton.addTransition(result.group(2), result.group(3), result.group(1))
-
-            # The detection of transitions means that the sequence of initial states ended.
-            wasEndOfInitalStates = True
-    
-    fh.close()
+    # the states before the first transition are initial
+    # and the states after it are accepting.
+    firstTransition = BA_TRANSITION.search(data)
+    endOfInitialStates = firstTransition.start() if firstTransition is not None else len(data)
+
+    # We found initial or accepting state "[q0]"
+    for match in BA_STATE.finditer(data):
+        if match.start() < endOfInitialStates:
+            automaton.addInitialState(match.group(1))
+        else:
+            automaton.addAcceptingState(match.group(1))
+
+    # We found transitions in the format "a,[q0]->[q1]".
+    # Create new transitions (add new states if not exists yet).
+    automaton.addTransitions((fromS, toS, byL) for byL, fromS, toS in BA_TRANSITION.findall(data))
+
+    parsingStats(stats, data, startTime)
     return automaton
@@ -0,0 +1,221 @@
+"""partition.py
+File with partition refinement algorithms. The refinement computes
+the coarsest partition stable with respect to all its blocks and all
+letters, which is a bisimulation.
+Author: Z3-in-NFA-reduction contributors
+Last change: 17.10.2026 - creation, refinePartition, refinementEQ
+             17.10.2026 - bisimulationReduction (exact pre-reduction)
+             17.10.2026 - refinementEQ documented as the bounded bisimulation
+"""
+
+
+from collections import defaultdict, deque
+from itertools import combinations
+
+
+def refinePartition(blocks, predTrans):
+    """Function refines partition of the states until it is stable.
+    Splitters are processed from a worklist. For each splitter block C and each
+    letter a the set pre_a(C) splits every block B into B ∩ pre_a(C) and B \\ pre_a(C).
+    Both halfs of a split block are returned into the worklist, so the
+    refinement is correct for nondeterministic transitions.
+
+    Only the states from the blocks are refined. Ancestors outside the
+    partition are ignored.
+
+    Args:
+        blocks (list): Initial partition. List of sets of states.
+        predTrans (dict): Transition dictionary used for the calculation of
+                          ancestors (backwardTrans for forward bisimulation).
+
+    Returns:
+        list: The list of sets of states (stable partition).
+    """
+
+    blocks = [set(block) for block in blocks if block]
+    blockOf = dict()
+    for index, block in enumerate(blocks):
+        for state in block:
+            blockOf[state] = index
+
+    worklist = deque(range(len(blocks)))
+    inWorklist = set(worklist)
+
+    while worklist:
+        splitter = worklist.popleft()
+        inWorklist.discard(splitter)
+
+        # Calculate pre_a(splitter) for all letters.
+        preByLetter = defaultdict(set)
+        for state in blocks[splitter]:
+            if state in predTrans:
+                for letter in predTrans[state]:
+                    preByLetter[letter].update(predTrans[state][letter])
+
+        for letter in preByLetter:
+            # Group the ancestors by their blocks.
+            touched = defaultdict(set)
+            for state in preByLetter[letter]:
+                if state in blockOf:
+                    touched[blockOf[state]].add(state)
+
+            for index in touched:
+                part = touched[index]
+                if len(part) == len(blocks[index]):
+                    # Whole block leads into the splitter, no split.
+                    continue
+                # Split the block and mark both parts as new splitters.
+                newIndex = len(blocks)
+                blocks.append(part)
+                blocks[index].difference_update(part)
+                for state in part:
+                    blockOf[state] = newIndex
+                for i in (index, newIndex):
+                    if i not in inWorklist:
+                        worklist.append(i)
+                        inWorklist.add(i)
+
+    return blocks
+
+
+def lookaheadStates(trans, states, steps):
+    """Function returns the states within the distance "steps" from the states
+    and the states at the distance steps + 1 (boundary).
+
+    Args:
+        trans (dict): Transition dictionary.
+        states (set): States from which the search starts.
+        steps (int): Maximal distance of the interior states.
+
+    Returns:
+        tuple: (interior, boundary) sets of states.
+    """
+
+    interior = set(states)
+    layer = set(states)
+    for step in range(steps + 1):
+        nextLayer = set()
+        for state in layer:
+            if state in trans:
+                for letter in trans[state]:
+                    nextLayer.update(trans[state][letter])
+        nextLayer.difference_update(interior)
+        if step == steps:
+            # Succesors of the last layer are not refined.
+            return interior, nextLayer
+        interior.update(nextLayer)
+        layer = nextLayer
+
+
+def lookaheadClasses(trans, predTrans, flagged, states, steps):
+    """Function computes the classes of lookahead-bounded bisimulation.
+
+    The states within the distance "steps" (interior) are refined.
+    The states at the distance steps + 1 (boundary) are kept as singletons,
+    so two states are equivalent only if theirs routes of the length
+    at most "steps" end in the same states. This makes the result sound
+    for merging without knowing the rest of the automaton.
+
+    Args:
+        trans (dict): Transition dictionary in the direction of equivalence.
+        predTrans (dict): Opposite transition dictionary.
+        flagged (set): Accepting (forward) or initial (backward) states.
+        states (set): States whose classes are returned.
+        steps (int): Lookahead.
+
+    Returns:
+        list: List of sets of "states" with the same class (only classes
+              with more than one member).
+    """
+
+    interior, boundary = lookaheadStates(trans, states, steps)
+    blocks = [interior.intersection(flagged), interior.difference(flagged)]
+    blocks.extend({state} for state in boundary)
+    classes = list()
+    for block in refinePartition(blocks, predTrans):
+        members = block.intersection(states)
+        if len(members) > 1:
+            classes.append(members)
+    return classes
+
+
+def refinementEQ(automaton, states, steps=1):
+    """Function calculates language equivalency (backward and forward)
+    of states set with the partition refinement. All classes of the states
+    are computed in one pass instead of pairwise BFS.
+
+    The relation is the lookahead-bounded bisimulation (see lookaheadClasses),
+    not the relation of the pairwise engine (Nfa.isForwardEQ and isBackwardEQ).
+    The pairwise engine compares sets of successors, so it pairs also states
+    with the same language, which are not bisimilar (one accepting successor
+    against two successors with the accepting flag and the transitions split
+    between them). The refinement refines the states at the distance "steps"
+    too, so it may pair states whose routes are longer than the lookahead
+    of the pairwise engine. Neither relation contains the other, but both
+    pair only states with the same language.
+
+    Args:
+        automaton (Nfa): NFA on which the equivalency is computed.
+        states (set): Set of states to compute equivalecy.
+        steps (int): Optional arrtibute (default 1). Steps on which the
+                     equivalence is calculated.
+
+    Returns:
+        tuple: Tuple of eqivalent states: tuple(backwardEQ, forwardEQ)
+               in the same form as algorithms.statesEQ.
+    """
+
+    forwardEQ = set()
+    for members in lookaheadClasses(automaton.forwardTrans, automaton.backwardTrans,
+                                    automaton.acceptingStates, states, steps):
+        forwardEQ.update(frozenset(pair) for pair in combinations(members, 2))
+
+    backwardEQ = set()
+    for members in lookaheadClasses(automaton.backwardTrans, automaton.forwardTrans,
+                                    automaton.initialStates, states, steps):
+        backwardEQ.update(frozenset(pair) for pair in combinations(members, 2))
+
+    return backwardEQ, forwardEQ
+
+
+def bisimulationClasses(trans, predTrans, flagged, states):
+    """Function computes the classes of the (unbounded) bisimulation
+    of all states. Bisimilar states have the same language.
+
+    Args:
+        trans (dict): Transition dictionary in the direction of bisimulation.
+        predTrans (dict): Opposite transition dictionary.
+        flagged (set): Accepting (forward) or initial (backward) states.
+        states (set): All states of the automaton.
+
+    Returns:
+        list: List of sets of states with the same class (only classes
+              with more than one member).
+    """
+
+    blocks = [states.intersection(flagged), states.difference(flagged)]
+    return [block for block in refinePartition(blocks, predTrans) if len(block) > 1]
+
+
+def bisimulationReduction(automaton):
+    """Function quotients the automaton by the forward and backward
+    bisimulation until no state is merged. The reduction is exact
+    (the language is preserved) and cheap, so it is used before
+    the solver minimization.
+
+    Args:
+        automaton (Nfa): Reduced automaton.
+
+    Returns:
+        int: Count of removed states.
+    """
+
+    statesCount = len(automaton.states)
+    while True:
+        before = len(automaton.states)
+        automaton.quotient(bisimulationClasses(automaton.forwardTrans, automaton.backwardTrans,
+                                               automaton.acceptingStates, automaton.states))
+        automaton.quotient(bisimulationClasses(automaton.backwardTrans, automaton.forwardTrans,
+                                               automaton.initialStates, automaton.states))
+        if len(automaton.states) == before:
+            return statesCount - len(automaton.states)
@@ -1,15 +1,46 @@
 """reduce.py
 File with the main part, that controls the minimiazion of the given automaton.
-Run as: python3 reduce.py imputAutomaton.ba iterationCnt [-noloop]
+Run as: python3 reduce.py imputAutomaton -format eqLookAhead [options]
+        python3 reduce.py directoryOrManifest eqLookAhead --batch [options]
 Author: Michal Šedý
 Last change: 13.03.2021 - creation
+             17.10.2026 - Arguments parsed by argparse, --eq-engine and --jobs options.
+                          Batch mode over directories and manifests with a pool of workers.
+                          Statistics of phases and events in JSON (--stats).
+                          Recursion limit is no longer raised (iterative pruneState).
+                          --expansion-budget and --partial-expansion options.
+                          --solver option (backend of the clusters).
+                          --cache-size and --cache-file options (cache of clusters).
+                          --time-budget and --anytime options (partial results).
+                          Simulation equivalence engine (--eq-engine simulation).
+                          --bisim option (exact bisimulation pre-reduction).
+                          --bitset-eq option (bit sets in the lookahead equivalence).
+                          Exceeded time budget without --anytime saves the partial result
+                          and ends with the error.
+                          --signature-steps option (depth of the state signatures).
+                          --solver is z3 by default, if z3 is installed.
+                          The cache of clusters is opt-in (--cache-size default 0).
 """
-from algorithms import solverMinimization, transitionsCount
+from algorithms import solverMinimization, transitionsCount, TimeBudgetExceeded
 from parse import parseBa, parseTimbuk
+from partition import bisimulationReduction
+from stats import Stats
+from error import error
+import solver
+import clustercache
+from multiprocessing import Pool
+import argparse
+import csv
+import json
+import os
 import time
 import sys
 
 
+SUMMARY_FIELDS = ("file", "output", "statesBefore", "statesAfter",
+                  "transitionsBefore", "transitionsAfter", "timeMs", "partial", "error")
+
+
 def timeMS():
     """Gives a count of miliseconds from 1.1.1970.
 
@@ -35,27 +66,49 @@ def automatonToFile(automaton, ba, fileName):
         sys.stdout = originalStdout
 
 
-def main():
-    """Main function. Parse automaton. Run minimization. Print results.
-    Run as: python3 reduce.py imputAutomaton -format eqLookAhead
+def reduceFile(fileName, ba, lookahead, engine="pairwise", workers=1,
+               expansionBudget=None, partialExpansion=False, backend="auto",
+               timeBudget=None, anytime=False, bisim=False, bitsetEQ=False, signatureSteps=0):
+    """Parse automaton, run minimization and save the result
+    next to the input file.
 
-    Raises:
-        AttributeError: Program attribute is missing, or many attributes given.
-    """
-    sys.setrecursionlimit(10**5)
-    # Control the count of the program arguments.
-    if len(sys.argv) < 4 or len(sys.argv) > 4:
-        raise AttributeError("Small or big count of program attributes.")
-    
-    if sys.argv[2] == "-B":
-        automatonName = sys.argv[1][:-3]
-        automaton = parseBa(sys.argv[1])
-    elif sys.argv[2] == "-T":
-        automatonName = sys.argv[1][:-7]
-        automaton = parseTimbuk(sys.argv[1])
-    else:
-        raise AttributeError("Unknown attribute {}".format(sys.argv[2]))
+    Args:
+        fileName (string): Input automaton.
+        ba (bool): True for BA format, False for Timbuk format.
+        lookahead (int): Lookahead of language equivalence approximation.
+        engine (string): Optional (default "pairwise"). Equivalence engine.
+        workers (int): Optional (default 1). Count of processes solving clusters.
+        expansionBudget (int): Optional (default None). Budget of the family
+                               simplification (see solverMinimization).
+        partialExpansion (bool): Optional (default False). Partial simplification
+                                 of the families over the budget.
+        backend (string): Optional (default "auto"). Solver backend of the clusters.
+        timeBudget (float): Optional (default None). Time budget of the minimization in seconds.
+        anytime (bool): Optional (default False). At the end of the budget, the best
+                        automaton so far is saved (marked as partial). Without anytime
+                        the partial automaton is saved too, but the summary has the error.
+        bisim (bool): Optional (default False). Quotient the automaton by the forward
+                      and backward bisimulation before the minimization.
+        bitsetEQ (bool): Optional (default False). Sets of states in the lookahead
+                         equivalence are int bit sets (see Nfa.bitsetEQ).
+        signatureSteps (int): Optional (default 0). Depth of the state signatures
+                              of the pairwise engine (see algorithms.statesEQ).
 
+    Returns:
+        dict: Summary of the reduction (see SUMMARY_FIELDS). Statistics
+              of the reduction are under the key "stats".
+    """
+    stats = Stats()
+    parseStats = dict()
+    # The extension is stripped whatever it is (the format may be forced by -B/-T).
+    automatonName = os.path.splitext(fileName)[0]
+    with stats.phase("parse"):
+        if ba:
+            automaton = parseBa(fileName, stats=parseStats)
+        else:
+            automaton = parseTimbuk(fileName, stats=parseStats)
+    automaton.bitsetEQ = bitsetEQ
+    outputName = "{}-{}_solver.{}".format(automatonName, lookahead, "ba" if ba else "timbuk")
 
     # Calculate automaton state befor minimization.
     statesCountBefore = len(automaton.states)
@@ -63,25 +116,286 @@ def main():
 
     # Run minimization n-time and count duration.
     startTime = timeMS()
-    automaton.cleanDeadStates()
+    with stats.phase("cleanDeadStates"):
+        automaton.cleanDeadStates()
+    if bisim:
+        with stats.phase("bisimulation"):
+            stats.count("bisimulationRemoved", bisimulationReduction(automaton))
     # automaton.makeCentralFinalState()
-    solverMinimization(automaton, int(sys.argv[3]))
-    automaton.cleanDeadStates()
+    budgetError = None
+    try:
+        solverMinimization(automaton, lookahead, engine=engine, workers=workers, stats=stats,
+                           expansionBudget=expansionBudget, partialExpansion=partialExpansion,
+                           backend=backend, timeBudget=timeBudget, anytime=anytime,
+                           signatureSteps=signatureSteps)
+    except TimeBudgetExceeded as e:
+        # The transaction of the last family is already closed, so the automaton
+        # has the original language and the partial result is saved too.
+        budgetError = "{0}: {1}".format(type(e).__name__, e)
+    with stats.phase("cleanDeadStates"):
+        automaton.cleanDeadStates()
     # Print automaton to file.
-    automatonToFile(automaton, (sys.argv[2] == "-B"), "{}-{}_solver.{}".format(automatonName, sys.argv[3], "ba" if sys.argv[2] == "-B" else "timbuk"))
+    with stats.phase("output"):
+        automatonToFile(automaton, ba, outputName)
     duration = timeMS() - startTime
-    # Calculate automaton state after minimization.
-    statesCountAfter = len(automaton.states)
-    transCountAfter = transitionsCount(automaton.forwardTrans)
+    stats.count("eqCacheHits", automaton.eqCacheHits)
+    stats.count("eqCacheMisses", automaton.eqCacheMisses)
+    stats.count("simulationComputations", automaton.simulationComputations)
+    stats.count("simulationUpdates", automaton.simulationUpdates)
 
-    # Print automaton states to stdout.
+    statsDict = stats.toDict()
+    statsDict["parse"] = parseStats
+    cacheHits = stats.counters["cacheHits"]
+    cacheLookups = cacheHits + stats.counters["cacheMisses"]
+    statsDict["cacheHitRate"] = cacheHits / cacheLookups if cacheLookups else 0.0
+    # The minimization was stopped by the time budget.
+    partial = stats.counters["budgetExceeded"] > 0
+    statsDict["partial"] = partial
+
+    return {"file": fileName,
+            "output": outputName,
+            "statesBefore": statesCountBefore,
+            "statesAfter": len(automaton.states),
+            "transitionsBefore": transCountBefore,
+            "transitionsAfter": transitionsCount(automaton.forwardTrans),
+            "timeMs": duration,
+            "partial": partial,
+            "error": budgetError,
+            "stats": statsDict}
+
+
+def batchFiles(path):
+    """Function returns the list of automata for the batch mode.
+    If the path is a directory, all BA and Timbuk files in the directory
+    tree are used (results of previous reductions are skipped). Otherwise
+    the path is a manifest with one automaton per line. Empty lines and
+    lines starting with # are ignored. Relative paths in the manifest are
+    relative to the manifest.
+
+    Args:
+        path (string): Directory or manifest.
+
+    Returns:
+        list: Paths to automata.
+    """
+    files = list()
+    if os.path.isdir(path):
+        for root, _, names in os.walk(path):
+            for name in names:
+                if name.endswith((".ba", ".timbuk")) and "_solver." not in name:
+                    files.append(os.path.join(root, name))
+        return sorted(files)
+
+    baseDir = os.path.dirname(path)
+    with open(path, "r") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            files.append(line if os.path.isabs(line) else os.path.join(baseDir, line))
+    return files
+
+
+def reduceTask(task):
+    """Reduce one automaton in the batch worker. Errors are reported
+    in the summary instead of stopping the batch.
+
+    Args:
+        task (tuple): (fileName, ba, lookahead, engine, expansionBudget, partialExpansion,
+                       backend, timeBudget, anytime, bisim, bitsetEQ, signatureSteps)
+
+    Returns:
+        dict: Summary of the reduction.
+    """
+    fileName, ba, lookahead, engine, expansionBudget, partialExpansion, backend, timeBudget, anytime, \
+        bisim, bitsetEQ, signatureSteps = task
+    try:
+        return reduceFile(fileName, ba, lookahead, engine=engine,
+                          expansionBudget=expansionBudget, partialExpansion=partialExpansion,
+                          backend=backend, timeBudget=timeBudget, anytime=anytime, bisim=bisim,
+                          bitsetEQ=bitsetEQ, signatureSteps=signatureSteps)
+    except Exception as e:
+        summary = dict.fromkeys(SUMMARY_FIELDS)
+        summary["file"] = fileName
+        summary["error"] = "{0}: {1}".format(type(e).__name__, e)
+        return summary
+
+
+def writeSummary(results, fileName):
+    """Write summary of the batch in CSV or JSON format (by the file extension).
+    If the file name is None, CSV is printed to stdout.
+
+    Args:
+        results (list): List of summaries.
+        fileName (string): Output file or None.
+    """
+    if fileName is not None and fileName.endswith(".json"):
+        with open(fileName, "w") as fd:
+            json.dump(results, fd, indent=2)
+        return
 
-    print("Result automaton was save as {}-{}_solver.{}".format(automatonName, sys.argv[3], "ba" if sys.argv[2] == "-B" else "timbuk"))
-    print("States before: {}".format(statesCountBefore))
-    print("States after: {}".format(statesCountAfter))
-    print("Transitions before: {}".format(transCountBefore))
-    print("Transitions after: {}".format(transCountAfter))
-    print("Time: {} ms".format(duration))
+    fd = open(fileName, "w", newline="") if fileName is not None else sys.stdout
+    writer = csv.DictWriter(fd, fieldnames=SUMMARY_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(results)
+    if fileName is not None:
+        fd.close()
+
+
+def writeStats(results, fileName, batchMode=False):
+    """Write statistics of the reduction into the JSON file.
+    In the batch mode the statistics are stored for each file.
+
+    Args:
+        results (list): List of summaries.
+        fileName (string): Output file.
+        batchMode (bool): Optional (default False). Statistics of more files.
+    """
+    if batchMode:
+        data = {result["file"]: result.get("stats") for result in results}
+    else:
+        data = results[0]["stats"]
+    with open(fileName, "w") as fd:
+        json.dump(data, fd, indent=2)
+
+
+def batch(args):
+    """Reduce all automata from the directory or the manifest
+    in the pool of workers.
+
+    Args:
+        args (Namespace): Parsed program arguments.
+
+    Returns:
+        list: List of summaries.
+    """
+    tasks = list()
+    for fileName in batchFiles(args.input):
+        if args.ba or args.timbuk:
+            ba = args.ba
+        elif fileName.endswith(".ba"):
+            ba = True
+        elif fileName.endswith(".timbuk"):
+            ba = False
+        else:
+            raise AttributeError("Unknown format of {}, use -B or -T".format(fileName))
+        tasks.append((fileName, ba, args.lookahead, args.engine,
+                      args.expansionBudget, args.partialExpansion, args.backend,
+                      args.timeBudget, args.anytime, args.bisim, args.bitsetEQ,
+                      args.signatureSteps))
+
+    with Pool(processes=args.jobs, initializer=clustercache.configureCache,
+              initargs=(args.cacheSize, args.cacheFile)) as pool:
+        results = list(pool.imap_unordered(reduceTask, tasks))
+    results.sort(key=lambda result: result["file"])
+    return results
+
+
+def parseArguments(argv):
+    """Parse program arguments.
+
+    Args:
+        argv (list): Program arguments without the program name.
+
+    Returns:
+        Namespace: Parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Reduction of NFA size using SAT solver Z3.")
+    parser.add_argument("input", help="input automaton (directory or manifest in the batch mode)")
+    formatGroup = parser.add_mutually_exclusive_group()
+    formatGroup.add_argument("-B", dest="ba", action="store_true", help="BA format")
+    formatGroup.add_argument("-T", dest="timbuk", action="store_true", help="Timbuk format")
+    parser.add_argument("lookahead", type=int, help="lookahead of language equivalence approximation")
+    parser.add_argument("--eq-engine", dest="engine", choices=("pairwise", "refinement", "simulation"),
+                        default="pairwise",
+                        help="engine of language equivalence: pairwise BFS (default), "
+                             "partition refinement or simulation equivalence")
+    parser.add_argument("--bitset-eq", dest="bitsetEQ", action="store_true",
+                        help="represent sets of states in the lookahead equivalence as bit sets "
+                             "(faster for larger lookahead)")
+    parser.add_argument("--signature-steps", dest="signatureSteps", type=int, default=0,
+                        help="depth of the state signatures, only states with the same signature "
+                             "are tested by the pairwise engine (default 0: flags and letters)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="count of processes solving independent family clusters "
+                             "(count of automata reduced in parallel in the batch mode)")
+    parser.add_argument("--expansion-budget", dest="expansionBudget", type=int, default=None,
+                        help="maximal predicted count of states of a family after "
+                             "the simplification, larger families are skipped")
+    parser.add_argument("--partial-expansion", dest="partialExpansion", action="store_true",
+                        help="simplify only a part of the families over the expansion budget "
+                             "instead of skipping them")
+    parser.add_argument("--solver", dest="backend", choices=solver.BACKENDS,
+                        default=solver.DEFAULT_BACKEND,
+                        help="solver of the clusters: z3 (default if z3 is installed), auto "
+                             "(default without z3, brute force for clusters with at most {0} "
+                             "conflict states, Z3 or greedy for the larger ones), bruteforce "
+                             "or greedy".format(solver.BRUTE_FORCE_LIMIT))
+    parser.add_argument("--cache-size", dest="cacheSize", type=int, default=0,
+                        help="count of solved clusters kept in memory (LRU), the cache is "
+                             "disabled by default; the key is a best-effort canonical form, "
+                             "so some isomorphic clusters miss the cache")
+    parser.add_argument("--cache-file", dest="cacheFile", default=None,
+                        help="sqlite file with solved clusters shared by processes and runs "
+                             "(enables the cache)")
+    parser.add_argument("--bisim", action="store_true",
+                        help="quotient the automaton by the forward and backward bisimulation "
+                             "before the minimization")
+    parser.add_argument("--time-budget", dest="timeBudget", type=float, default=None,
+                        help="wall-clock budget of the minimization in seconds (for each file), "
+                             "solver timeouts are derived from the remaining time")
+    parser.add_argument("--anytime", action="store_true",
+                        help="at the end of the time budget save the best automaton so far "
+                             "(marked as partial) without reporting the error")
+    parser.add_argument("--batch", action="store_true",
+                        help="reduce all automata from the directory or the manifest")
+    parser.add_argument("--summary", default=None,
+                        help="summary file of the batch mode (.csv or .json), "
+                             "CSV is printed to stdout by default")
+    parser.add_argument("--stats", default=None,
+                        help="JSON file with durations of the phases and counts of the events "
+                             "(for each file in the batch mode)")
+    args = parser.parse_args(argv)
+    if not args.batch and not args.ba and not args.timbuk:
+        parser.error("one of the arguments -B -T is required")
+    return args
+
+
+def main():
+    """Main function. Parse automaton. Run minimization. Print results.
+    Run as: python3 reduce.py imputAutomaton -format eqLookAhead [options]
+    """
+    args = parseArguments(sys.argv[1:])
+    clustercache.configureCache(args.cacheSize, args.cacheFile)
+
+    if args.batch:
+        results = batch(args)
+        writeSummary(results, args.summary)
+        if args.stats is not None:
+            writeStats(results, args.stats, batchMode=True)
+        return
+
+    result = reduceFile(args.input, args.ba, args.lookahead, engine=args.engine, workers=args.jobs,
+                        expansionBudget=args.expansionBudget, partialExpansion=args.partialExpansion,
+                        backend=args.backend, timeBudget=args.timeBudget, anytime=args.anytime,
+                        bisim=args.bisim, bitsetEQ=args.bitsetEQ, signatureSteps=args.signatureSteps)
+    if args.stats is not None:
+        writeStats([result], args.stats)
+
+    # Print automaton states to stdout.
+    print("Result automaton was save as {}".format(result["output"]))
+    print("States before: {}".format(result["statesBefore"]))
+    print("States after: {}".format(result["statesAfter"]))
+    if args.bisim:
+        print("Removed by bisimulation: {}".format(result["stats"]["counters"]["bisimulationRemoved"]))
+    print("Transitions before: {}".format(result["transitionsBefore"]))
+    print("Transitions after: {}".format(result["transitionsAfter"]))
+    print("Time: {} ms".format(result["timeMs"]))
+    if result["partial"]:
+        print("Time budget exceeded, the result is partial")
+    if result["error"] is not None:
+        error("reduceFile()", result["error"])
+        sys.exit(1)
 
 
 if __name__ == '__main__':
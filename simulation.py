@@ -0,0 +1,350 @@
+"""simulation.py
+File with the calculation of the maximal simulation preorder. States, which
+simulate each other (forward or backward), have the same language
+and can be merged.
+Author: Z3-in-NFA-reduction contributors
+Last change: 17.10.2026 - creation, simulationPreorder, simulationClasses, simulationEQ
+             17.10.2026 - class Simulation (refinement of the relation after changes)
+"""
+
+
+from collections import defaultdict, deque
+from itertools import combinations
+
+
+def bits(mask):
+    """Generator of the indexes of set bits in the mask.
+
+    Args:
+        mask (int): Bit set.
+
+    Yields:
+        int: Index of the set bit.
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class Simulation():
+    """Class of the simulation preorder of one direction (forward or backward).
+    The relation is computed by the counter algorithm of Henzinger, Henzinger
+    and Kopke. Sets of states are int bit sets over interned ids of states,
+    so the counters are replaced by the test of an empty intersection of the
+    successors and the simulating states.
+
+    The state r simulates the state q, if q flagged implies r flagged and
+    for each transition q -a-> q' there is a transition r -a-> r', where
+    r' simulates q'.
+
+    After changes of the automaton, the relation is refined by update from
+    the previous relation. Only the changed states are rechecked, so the
+    result is a simulation, but it may miss pairs, which became similar
+    by the changes (compute gives the maximal relation again).
+    """
+
+    def __init__(self):
+        """Initial function creates the empty relation.
+        """
+        self.index = dict()
+        self.order = list()
+        self.free = list()
+        # sim[i] is the bit set of states simulating the state with id i.
+        self.sim = dict()
+
+
+    def compute(self, trans, predTrans, flaggedStates, states):
+        """Function computes the maximal simulation preorder.
+
+        Args:
+            trans (dict): Transition dictionary in the direction of simulation
+                          (forwardTrans for forward simulation).
+            predTrans (dict): Opposite transition dictionary.
+            flaggedStates (set): Accepting (forward) or initial (backward) states.
+            states (set): All states of the automaton.
+        """
+        self.index = dict()
+        self.order = list()
+        self.free = list()
+        for state in sorted(states, key=str):
+            self.__intern(state)
+        self.__structures(trans, predTrans, flaggedStates)
+        initMasks = self.__initMasks()
+        self.sim = dict(initMasks)
+        self.__remove = defaultdict(dict)
+        self.__worklist = deque()
+        for letter, preds in self.__pre.items():
+            for v in preds:
+                self.__seedRemove(letter, v)
+        self.__refine()
+
+
+    def update(self, trans, predTrans, flaggedStates, states, touchedStates):
+        """Function refines the relation after changes of the automaton.
+        Removed states are dropped, new states are added with all candidates
+        allowed by the flags and letters, and the pairs of the changed states
+        are rechecked (the violations are propagated by the refinement).
+
+        Args:
+            trans (dict): Transition dictionary in the direction of simulation.
+            predTrans (dict): Opposite transition dictionary.
+            flaggedStates (set): Accepting (forward) or initial (backward) states.
+            states (set): All states of the automaton.
+            touchedStates (set): States changed since the last computation.
+        """
+        # Drop the removed states, their ids are reused.
+        removedMask = 0
+        for state in [state for state in self.index if state not in states]:
+            stateId = self.index.pop(state)
+            self.order[stateId] = None
+            self.free.append(stateId)
+            del self.sim[stateId]
+            removedMask |= 1 << stateId
+        if removedMask:
+            for i in self.sim:
+                self.sim[i] &= ~removedMask
+
+        newMask = 0
+        for state in states:
+            if state not in self.index:
+                newMask |= 1 << self.__intern(state)
+        self.__structures(trans, predTrans, flaggedStates)
+        initMasks = self.__initMasks()
+        self.__remove = defaultdict(dict)
+        self.__worklist = deque()
+
+        # New states are candidates of all states (if the flags and letters allow it).
+        for i in initMasks:
+            if newMask >> i & 1:
+                self.sim[i] = initMasks[i]
+            else:
+                self.sim[i] |= newMask & initMasks[i]
+        changed = newMask
+        for state in touchedStates:
+            if state in self.index:
+                changed |= 1 << self.index[state]
+
+        # Flags and letters of the changed states.
+        for u in bits(changed):
+            self.__shrink(u, self.sim[u] & ~initMasks[u])
+        for u, initMask in initMasks.items():
+            self.__shrink(u, self.sim[u] & changed & ~initMask)
+
+        # Changed predecessors of v (or changed v): all states without a successor
+        # simulating v. Changed successors of w: w is tested against all states.
+        for v in bits(changed):
+            for letter, preds in self.__pre.items():
+                if v in preds:
+                    self.__seedRemove(letter, v)
+        for w in bits(changed):
+            for letter in self.__letters[w]:
+                successors = self.__post[letter][w]
+                for v in self.__pre[letter]:
+                    if not successors & self.sim[v]:
+                        self.__addRemove(letter, v, 1 << w)
+        self.__refine()
+
+
+    def classes(self):
+        """Function returns the classes of simulation equivalence
+        (states simulating each other).
+
+        Returns:
+            dict: Class (int) of each state.
+        """
+        sim = self.sim
+        classes = dict()
+        for state, i in self.index.items():
+            # The first state (by id) simulating each other is the representative
+            # (the state simulates itself, so it is found at last at the id i).
+            for j in bits(sim[i]):
+                if sim[j] >> i & 1:
+                    classes[state] = j
+                    break
+        return classes
+
+
+    def __intern(self, state):
+        """Function assigns the id to the state. Ids of removed states are reused.
+
+        Args:
+            state (string): State.
+
+        Returns:
+            int: Id of the state.
+        """
+        if self.free:
+            stateId = self.free.pop()
+            self.order[stateId] = state
+        else:
+            stateId = len(self.order)
+            self.order.append(state)
+        self.index[state] = stateId
+        return stateId
+
+
+    def __structures(self, trans, predTrans, flaggedStates):
+        """Function builds the successors (bit sets) and the predecessors (lists)
+        of the states by letters.
+
+        Args:
+            trans (dict): Transition dictionary in the direction of simulation.
+            predTrans (dict): Opposite transition dictionary.
+            flaggedStates (set): Accepting (forward) or initial (backward) states.
+        """
+        index = self.index
+        self.__post = defaultdict(dict)
+        self.__pre = defaultdict(dict)
+        self.__letters = dict()
+        self.__hasLetter = defaultdict(int)
+        for state, i in index.items():
+            self.__letters[i] = list()
+            for letter, targets in trans.get(state, dict()).items():
+                if targets:
+                    mask = 0
+                    for target in targets:
+                        mask |= 1 << index[target]
+                    self.__post[letter][i] = mask
+                    self.__hasLetter[letter] |= 1 << i
+                    self.__letters[i].append(letter)
+            for letter, sources in predTrans.get(state, dict()).items():
+                if sources:
+                    self.__pre[letter][i] = [index[source] for source in sources]
+        self.__flaggedMask = 0
+        for state in flaggedStates:
+            if state in index:
+                self.__flaggedMask |= 1 << index[state]
+
+
+    def __initMasks(self):
+        """Function calculates the initial relation given by flags and letters.
+
+        Returns:
+            dict: Id of the state -> bit set of the states allowed to simulate it.
+        """
+        allMask = 0
+        for i in self.index.values():
+            allMask |= 1 << i
+        initMasks = dict()
+        for i in self.index.values():
+            mask = allMask
+            if self.__flaggedMask >> i & 1:
+                mask &= self.__flaggedMask
+            for letter in self.__letters[i]:
+                mask &= self.__hasLetter[letter]
+            initMasks[i] = mask
+        return initMasks
+
+
+    def __addRemove(self, letter, v, mask):
+        """Function adds the states to the set remove[letter][v]
+        (states with a letter-successor, but none simulating v).
+
+        Args:
+            letter (string): Letter.
+            v (int): Id of the state.
+            mask (int): Bit set of the states.
+        """
+        if v not in self.__remove[letter]:
+            self.__remove[letter][v] = 0
+            self.__worklist.append((letter, v))
+        self.__remove[letter][v] |= mask
+
+
+    def __seedRemove(self, letter, v):
+        """Function computes the whole set remove[letter][v].
+
+        Args:
+            letter (string): Letter.
+            v (int): Id of the state.
+        """
+        predOfSim = 0
+        preds = self.__pre[letter]
+        for j in bits(self.sim[v]):
+            for k in preds.get(j, ()):
+                predOfSim |= 1 << k
+        mask = self.__hasLetter[letter] & ~predOfSim
+        if mask:
+            self.__addRemove(letter, v, mask)
+
+
+    def __shrink(self, u, lost):
+        """Function removes the states from the states simulating u. Predecessors
+        of the removed states, which lost their last successor simulating u,
+        are added to the remove sets of u.
+
+        Args:
+            u (int): Id of the state.
+            lost (int): Bit set of the states, which do not simulate u.
+        """
+        if not lost:
+            return
+        sim = self.sim
+        sim[u] &= ~lost
+        for w in bits(lost):
+            for predLetter, preds in self.__pre.items():
+                # Only the states with predecessors by the letter are refined.
+                if u not in preds:
+                    continue
+                for k in preds.get(w, ()):
+                    if not self.__post[predLetter][k] & sim[u]:
+                        self.__addRemove(predLetter, u, 1 << k)
+
+
+    def __refine(self):
+        """Function processes the worklist of remove sets until the relation
+        is a simulation.
+        """
+        while self.__worklist:
+            letter, v = self.__worklist.popleft()
+            removed = self.__remove[letter].pop(v)
+            # No state of removed can simulate a predecessor u of v.
+            for u in self.__pre[letter].get(v, ()):
+                self.__shrink(u, self.sim[u] & removed)
+
+
+def simulationPreorder(trans, predTrans, flaggedStates, states):
+    """Function calculates the maximal simulation preorder.
+
+    Args:
+        trans (dict): Transition dictionary in the direction of simulation
+                      (forwardTrans for forward simulation).
+        predTrans (dict): Opposite transition dictionary.
+        flaggedStates (set): Accepting (forward) or initial (backward) states.
+        states (set): All states of the automaton.
+
+    Returns:
+        dict: State -> set of the states simulating it.
+    """
+
+    relation = Simulation()
+    relation.compute(trans, predTrans, flaggedStates, states)
+    return {state: {relation.order[j] for j in bits(relation.sim[i])}
+            for state, i in relation.index.items()}
+
+
+def simulationEQ(automaton, states):
+    """Function calculates backward and forward equivalent pairs of the states
+    by the simulation equivalence of the whole automaton. The relation is kept
+    by the automaton and refined after its changes (see Nfa.simulationClasses).
+    States, which are no longer in the automaton, are skipped.
+
+    Args:
+        automaton (Nfa): NFA on which the equivalency is computed.
+        states (set): Set of states to compute equivalecy.
+
+    Returns:
+        tuple: Tuple of eqivalent states: tuple(backwardEQ, forwardEQ)
+               (see algorithms.statesEQ).
+    """
+
+    result = list()
+    for classes in automaton.simulationClasses():
+        groups = defaultdict(list)
+        for state in states:
+            if state in classes:
+                groups[classes[state]].append(state)
+        result.append({frozenset({r, s}) for group in groups.values()
+                       for r, s in combinations(group, 2)})
+    return tuple(result)
@@ -0,0 +1,293 @@
+"""solver.py
+File with the solver layer for the selection of merged states.
+Author: Z3-in-NFA-reduction contributors
+Last change: 17.10.2026 - creation, Z3Optimizer (reusable z3 context with push/pop)
+                          Backends BruteForceSolver and GreedySolver, selection
+                          of the backend by the cluster size, z3 is optional.
+                          Timeout of each solve call, nothing is merged if the
+                          solver timed out without a model.
+             17.10.2026 - The auto selection uses z3 for all clusters, if it is installed.
+             17.10.2026 - The auto selection is by the cluster size again,
+                          DEFAULT_BACKEND is z3 if it is installed.
+"""
+
+
+import nfa
+import os
+try:
+    from z3 import Context, Optimize, Bool, And, Implies, Not, is_true, unknown, Z3Exception
+    HAS_Z3 = True
+except ImportError:
+    HAS_Z3 = False
+
+
+# Names of the backends for the selection (see getBackend).
+BACKENDS = ("auto", "bruteforce", "greedy", "z3")
+# Backend of the command line, z3 keeps the result of the original Z3 reduction.
+DEFAULT_BACKEND = "z3" if HAS_Z3 else "auto"
+# The auto selection uses brute force for clusters with at most this count
+# of conflict states (states in backward and forward pairs).
+BRUTE_FORCE_LIMIT = 10
+# Default timeout of one solver call in ms.
+DEFAULT_TIMEOUT = 60000
+
+# Optimizer of the current process (see getOptimizer).
+_optimizer = None
+
+
+def conflictStates(backwardEq, forwardEq):
+    """Function returns the states of backward pairs, forward pairs and states
+    used in both (conflict states). Only the conflict states have to be decided,
+    other states are always merged in their only direction.
+
+    Args:
+        backwardEq (set): The set of backward equivalent pairs of states.
+        forwardEq (set): The set of forward equivalent paris of states.
+
+    Returns:
+        tuple: (backward states, forward states, conflict states)
+    """
+
+    backwardStates = frozenset.union(*backwardEq) if backwardEq else frozenset()
+    forwardStates = frozenset.union(*forwardEq) if forwardEq else frozenset()
+    return backwardStates, forwardStates, backwardStates.intersection(forwardStates)
+
+
+class BruteForceSolver():
+    """Exact backend. All 2^k decisions of k conflict states (backward or
+    forward merge) are enumerated. Suitable for tiny clusters only.
+    """
+
+    name = "bruteforce"
+    # Solutions are optimal (can be cached).
+    exact = True
+
+    def solve(self, backwardEq, forwardEq, timeout=None):
+        """Function finds the states, which are merged with some other state in
+        backward or forward, so the count of merged pairs is maximal.
+
+        Args:
+            backwardEq (set): The set of backward equivalent pairs of states.
+            forwardEq (set): The set of forward equivalent paris of states.
+            timeout (int): Optional (default None). Not used.
+
+        Returns:
+            tuple: (backward merged states, forward merged states, False)
+        """
+
+        backwardStates, forwardStates, conflicts = conflictStates(backwardEq, forwardEq)
+        conflicts = sorted(conflicts, key=str)
+        bit = {state: 1 << index for index, state in enumerate(conflicts)}
+        # Masks of conflict states, which must be backward (forward) for the pair.
+        backwardMasks = [bit.get(r, 0) | bit.get(s, 0) for r, s in backwardEq]
+        forwardMasks = [bit.get(r, 0) | bit.get(s, 0) for r, s in forwardEq]
+
+        # Bit 1 in the decision means backward merge of the conflict state.
+        bestDecision = 0
+        bestScore = -1
+        for decision in range(1 << len(conflicts)):
+            score = sum(1 for mask in backwardMasks if mask & decision == mask)
+            score += sum(1 for mask in forwardMasks if not mask & decision)
+            if score > bestScore:
+                bestScore = score
+                bestDecision = decision
+
+        backwardTrue = {state for state in backwardStates
+                        if state not in bit or bit[state] & bestDecision}
+        forwardTrue = {state for state in forwardStates
+                       if state not in bit or not bit[state] & bestDecision}
+        return backwardTrue, forwardTrue, False
+
+
+class GreedySolver():
+    """Heuristic backend. Each conflict state is decided by the count of its
+    backward and forward pairs. Then the decisions are flipped while it
+    increases the count of merged pairs (local search).
+    """
+
+    name = "greedy"
+    exact = False
+
+    def solve(self, backwardEq, forwardEq, timeout=None):
+        """Function finds the states, which are merged with some other state in
+        backward or forward. The count of merged pairs is not guaranteed to be maximal.
+
+        Args:
+            backwardEq (set): The set of backward equivalent pairs of states.
+            forwardEq (set): The set of forward equivalent paris of states.
+            timeout (int): Optional (default None). Not used.
+
+        Returns:
+            tuple: (backward merged states, forward merged states, False)
+        """
+
+        backwardStates, forwardStates, conflicts = conflictStates(backwardEq, forwardEq)
+        # Pairs of each conflict state in both directions.
+        backwardPairs = {state: [pair for pair in backwardEq if state in pair] for state in conflicts}
+        forwardPairs = {state: [pair for pair in forwardEq if state in pair] for state in conflicts}
+        # True means backward merge of the conflict state.
+        isBackward = {state: len(backwardPairs[state]) >= len(forwardPairs[state]) for state in conflicts}
+
+        def merged(pair, backward):
+            # Pair is merged if both states are merged in its direction.
+            return all(isBackward.get(state, backward) == backward for state in pair)
+
+        changed = True
+        while changed:
+            changed = False
+            for state in sorted(conflicts, key=str):
+                before = sum(merged(pair, True) for pair in backwardPairs[state]) + \
+                         sum(merged(pair, False) for pair in forwardPairs[state])
+                isBackward[state] = not isBackward[state]
+                after = sum(merged(pair, True) for pair in backwardPairs[state]) + \
+                        sum(merged(pair, False) for pair in forwardPairs[state])
+                if after > before:
+                    changed = True
+                else:
+                    isBackward[state] = not isBackward[state]
+
+        backwardTrue = {state for state in backwardStates if isBackward.get(state, True)}
+        forwardTrue = {state for state in forwardStates if not isBackward.get(state, False)}
+        return backwardTrue, forwardTrue, False
+
+
+class Z3Optimizer():
+    """Class with one z3 context and one optimizer reused for all clusters.
+    Each cluster is solved in its own scope (push/pop). Variables are indexed
+    by integers and created only once in the context. For the state with the
+    index i, the variable 2*i means backward merge and 2*i + 1 forward merge.
+    """
+
+    name = "z3"
+    exact = True
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
+        """Initial function creates the z3 context and the optimizer.
+
+        Args:
+            timeout (int): Optional (default DEFAULT_TIMEOUT). Timeout of one check in ms.
+        """
+        self.context = Context()
+        self.optimizer = Optimize(ctx=self.context)
+        self.timeout = timeout
+        self.__variables = list()
+        # Process, which owns the context.
+        self.pid = os.getpid()
+
+
+    def __variable(self, index):
+        """Function returns the Bool variable with the given index.
+        Missing variables are created.
+
+        Args:
+            index (int): Index of the variable.
+
+        Returns:
+            BoolRef: z3 variable.
+        """
+        while len(self.__variables) <= index:
+            self.__variables.append(Bool("v{0}".format(len(self.__variables)), self.context))
+        return self.__variables[index]
+
+
+    def solve(self, backwardEq, forwardEq, timeout=None):
+        """Function finds the states, which are merged with some other state in
+        backward or forward. Each equivalent pair is a soft constraint. The state
+        can not be used in backward and forward merge together.
+
+        Args:
+            backwardEq (set): The set of backward equivalent pairs of states.
+            forwardEq (set): The set of forward equivalent paris of states.
+            timeout (int): Optional (default None). Timeout of the check in ms,
+                           the timeout of the optimizer is used by default.
+
+        Returns:
+            tuple: (backward merged states, forward merged states,
+                    True if the solver ended by timeout). If the solver ended
+                    by timeout without any model, no state is merged.
+        """
+
+        backwardStates, forwardStates, _ = conflictStates(backwardEq, forwardEq)
+        stateIndex = {state: index for index, state in enumerate(backwardStates.union(forwardStates))}
+        backwardVar = {state: self.__variable(2 * stateIndex[state]) for state in backwardStates}
+        forwardVar = {state: self.__variable(2 * stateIndex[state] + 1) for state in forwardStates}
+
+        self.optimizer.set("timeout", self.timeout if timeout is None else timeout)
+        self.optimizer.push()
+        try:
+            # (q1_B /\ q2_B) stands for backward equivalent states q1 and q2.
+            for r, s in backwardEq:
+                self.optimizer.add_soft(And(backwardVar[r], backwardVar[s]))
+            for r, s in forwardEq:
+                self.optimizer.add_soft(And(forwardVar[r], forwardVar[s]))
+            # Rule = "q1_B => ~q1_F"
+            for state in backwardStates.intersection(forwardStates):
+                self.optimizer.add(Implies(backwardVar[state], Not(forwardVar[state])))
+
+            result = self.optimizer.check()
+            try:
+                model = self.optimizer.model()
+            except Z3Exception:
+                # Timeout before the first model, no state is merged.
+                return set(), set(), True
+            backwardTrue = {state for state, var in backwardVar.items()
+                            if is_true(model.eval(var, model_completion=True))}
+            forwardTrue = {state for state, var in forwardVar.items()
+                           if is_true(model.eval(var, model_completion=True))}
+        finally:
+            self.optimizer.pop()
+
+        return backwardTrue, forwardTrue, result == unknown
+
+
+def getOptimizer():
+    """Function returns the optimizer of the current process. The optimizer
+    is created by the first call in each process (z3 context is not shared
+    with forked worker processes).
+
+    Raises:
+        BadType: If z3 is not installed.
+
+    Returns:
+        Z3Optimizer: Optimizer of the process.
+    """
+    global _optimizer
+    if not HAS_Z3:
+        raise nfa.BadType("Z3 solver backend is not available (z3 is not installed)")
+    if _optimizer is None or _optimizer.pid != os.getpid():
+        _optimizer = Z3Optimizer()
+    return _optimizer
+
+
+def getBackend(backwardEq, forwardEq, backend="auto"):
+    """Function returns the backend for the cluster. The "auto" selection
+    uses brute force for clusters with at most BRUTE_FORCE_LIMIT conflict states.
+    Larger clusters are solved by Z3, or by the greedy heuristic if z3 is not
+    installed.
+
+    Args:
+        backwardEq (set): The set of backward equivalent pairs of states.
+        forwardEq (set): The set of forward equivalent paris of states.
+        backend (string): Optional (default "auto"). One of BACKENDS.
+
+    Raises:
+        BadType: If the backend is unknown or not available.
+
+    Returns:
+        object: Backend with the method solve(backwardEq, forwardEq).
+    """
+    if backend == "auto":
+        if len(conflictStates(backwardEq, forwardEq)[2]) <= BRUTE_FORCE_LIMIT:
+            backend = "bruteforce"
+        elif HAS_Z3:
+            backend = "z3"
+        else:
+            backend = "greedy"
+
+    if backend == "bruteforce":
+        return BruteForceSolver()
+    elif backend == "greedy":
+        return GreedySolver()
+    elif backend == "z3":
+        return getOptimizer()
+    raise nfa.BadType("Bad solver backend {0}".format(backend))
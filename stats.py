@@ -0,0 +1,83 @@
+"""stats.py
+File with the instrumentation of the minimization. Phases are timed
+and events are counted. Results are exported as dictionary (JSON).
+Author: Z3-in-NFA-reduction contributors
+Last change: 17.10.2026 - creation
+"""
+
+
+from collections import defaultdict
+from contextlib import contextmanager
+import time
+
+
+class Stats():
+    """Class collects the durations of the phases and counters of the events.
+    Each phase holds the count of calls and the total duration in seconds.
+    """
+
+    def __init__(self):
+        """Initial function creates empty statistics.
+        """
+        self.phases = defaultdict(lambda: {"calls": 0, "seconds": 0.0})
+        self.counters = defaultdict(int)
+
+
+    @contextmanager
+    def phase(self, name):
+        """Context manager measures the duration of the block
+        and adds it to the phase.
+
+        Args:
+            name (string): Name of the phase.
+        """
+        startTime = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.addPhase(name, time.perf_counter() - startTime)
+
+
+    def addPhase(self, name, seconds, calls=1):
+        """Add duration to the phase.
+
+        Args:
+            name (string): Name of the phase.
+            seconds (float): Duration in seconds.
+            calls (int): Optional (default 1). Count of calls.
+        """
+        self.phases[name]["calls"] += calls
+        self.phases[name]["seconds"] += seconds
+
+
+    def count(self, name, value=1):
+        """Increase the counter.
+
+        Args:
+            name (string): Name of the counter.
+            value (int): Optional (default 1). Increment.
+        """
+        self.counters[name] += value
+
+
+    def merge(self, other):
+        """Add statistics from the other statistics (for example
+        from the worker process).
+
+        Args:
+            other (dict): Statistics in the form of Stats.toDict().
+        """
+        for name, phase in other["phases"].items():
+            self.addPhase(name, phase["seconds"], phase["calls"])
+        for name, value in other["counters"].items():
+            self.count(name, value)
+
+
+    def toDict(self):
+        """Export statistics into the dictionary.
+
+        Returns:
+            dict: {"phases": {name: {"calls", "seconds"}}, "counters": {name: value}}
+        """
+        return {"phases": {name: dict(phase) for name, phase in self.phases.items()},
+                "counters": dict(self.counters)}
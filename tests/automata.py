@@ -0,0 +1,166 @@
+"""automata.py
+Auxiliary functions of the tests: random automata and the test
+of the language equivalence of two automata.
+"""
+
+
+import random
+from nfa import Nfa
+
+
+def randomNfa(seed, states=None, letters=None, density=None):
+    """Function creates the random automaton. The dead states are removed.
+
+    Args:
+        seed (int): Seed of the random generator.
+        states (int): Optional (default random 4-20). Count of states.
+        letters (int): Optional (default random 1-3). Size of the alphabet.
+        density (float): Optional (default random 1-2.5). Transitions per state.
+
+    Returns:
+        Nfa: Random automaton.
+    """
+    rnd = random.Random(seed)
+    states = states or rnd.randint(4, 20)
+    letters = "abc"[:letters or rnd.randint(1, 3)]
+    density = density or rnd.uniform(1.0, 2.5)
+    automaton = Nfa()
+    for state in rnd.sample(range(states), rnd.randint(1, 2)):
+        automaton.addInitialState(str(state))
+    for _ in range(int(states * density)):
+        automaton.addTransition(str(rnd.randrange(states)), str(rnd.randrange(states)),
+                                rnd.choice(letters))
+    for state in rnd.sample(range(states), rnd.randint(1, 3)):
+        automaton.addAcceptingState(str(state))
+    automaton.cleanDeadStates()
+    return automaton
+
+
+def copyNfa(automaton):
+    """Function creates the independent copy of the automaton.
+
+    Args:
+        automaton (Nfa): Copied automaton.
+
+    Returns:
+        Nfa: Copy of the automaton.
+    """
+    result = Nfa()
+    for state in automaton.initialStates:
+        result.addInitialState(state)
+    for state in automaton.acceptingStates:
+        result.addAcceptingState(state)
+    result.addTransitions((fromS, toS, byL) for fromS in automaton.forwardTrans
+                          for byL in automaton.forwardTrans[fromS]
+                          for toS in automaton.forwardTrans[fromS][byL])
+    result.states.update(automaton.states)
+    return result
+
+
+def determinize(automaton, alphabet):
+    """Function determinizes the automaton by the subset construction.
+
+    Args:
+        automaton (Nfa): Determinized automaton.
+        alphabet (list): Letters of the result.
+
+    Returns:
+        tuple: (transitions, accepting) - dict (subset, letter) -> subset
+               and set of the accepting subsets. The initial subset
+               is the set of initial states.
+    """
+    start = frozenset(automaton.initialStates)
+    transitions = dict()
+    accepting = set()
+    seen = {start}
+    worklist = [start]
+    while worklist:
+        subset = worklist.pop()
+        if not subset.isdisjoint(automaton.acceptingStates):
+            accepting.add(subset)
+        for letter in alphabet:
+            target = frozenset(toS for state in subset
+                               for toS in automaton.forwardTrans.get(state, dict()).get(letter, ()))
+            transitions[(subset, letter)] = target
+            if target not in seen:
+                seen.add(target)
+                worklist.append(target)
+    return transitions, accepting
+
+
+def sameLanguage(first, second):
+    """Function tests the language equivalence of two automata
+    (by the product of their determinized automata).
+
+    Args:
+        first (Nfa): First automaton.
+        second (Nfa): Second automaton.
+
+    Returns:
+        bool: True if the languages are equal.
+    """
+    alphabet = sorted(first.getAlphabet() | second.getAlphabet())
+    firstTrans, firstAccepting = determinize(first, alphabet)
+    secondTrans, secondAccepting = determinize(second, alphabet)
+    start = (frozenset(first.initialStates), frozenset(second.initialStates))
+    seen = {start}
+    worklist = [start]
+    while worklist:
+        x, y = worklist.pop()
+        if (x in firstAccepting) != (y in secondAccepting):
+            return False
+        for letter in alphabet:
+            pair = (firstTrans[(x, letter)], secondTrans[(y, letter)])
+            if pair not in seen:
+                seen.add(pair)
+                worklist.append(pair)
+    return True
+
+
+def checkConsistency(automaton):
+    """Function asserts, that the forward and backward transitions correspond
+    and all their states are in the automaton.
+
+    Args:
+        automaton (Nfa): Tested automaton.
+    """
+    for trans, opposite in ((automaton.forwardTrans, automaton.backwardTrans),
+                            (automaton.backwardTrans, automaton.forwardTrans)):
+        for state, letters in trans.items():
+            for letter, targets in letters.items():
+                assert targets
+                assert state in automaton.states
+                for target in targets:
+                    assert target in automaton.states
+                    assert state in opposite[target][letter]
+    for state in automaton.states:
+        assert automaton.inDegree(state) == sum(len(sources - {state}) for sources in
+                                                automaton.backwardTrans.get(state, dict()).values())
+        assert automaton.outDegree(state) == sum(len(targets - {state}) for targets in
+                                                 automaton.forwardTrans.get(state, dict()).values())
+
+
+def stateAutomaton(automaton, state, forward=True):
+    """Function creates the automaton of the language of the state. The forward
+    language starts in the state, the backward language is the reversed language
+    of the words ending in the state.
+
+    Args:
+        automaton (Nfa): Automaton with the state.
+        state (string): State.
+        forward (bool): Optional (default True). Forward or backward language.
+
+    Returns:
+        Nfa: Automaton of the language.
+    """
+    result = Nfa()
+    result.addInitialState(state)
+    if forward:
+        trans, flaggedStates = automaton.forwardTrans, automaton.acceptingStates
+    else:
+        trans, flaggedStates = automaton.backwardTrans, automaton.initialStates
+    for flaggedState in flaggedStates:
+        result.addAcceptingState(flaggedState)
+    result.addTransitions((fromS, toS, byL) for fromS in trans for byL in trans[fromS]
+                          for toS in trans[fromS][byL])
+    return result
@@ -0,0 +1,10 @@
+"""conftest.py
+The modules of the reduction are flat in the root of the repository,
+so the root is added to the import path of the tests.
+"""
+
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
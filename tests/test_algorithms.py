@@ -0,0 +1,109 @@
+"""test_algorithms.py
+Tests of the minimization (algorithms.py).
+"""
+
+
+import random
+import pytest
+import algorithms
+import solver
+from automata import randomNfa, copyNfa, sameLanguage, checkConsistency
+
+
+def naiveMergeSets(listOfSets):
+    """Merging of sets with common items by repeated joining."""
+    groups = [set(each) for each in listOfSets if each]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(groups)):
+            for j in range(i + 1, len(groups)):
+                if not groups[i].isdisjoint(groups[j]):
+                    groups[i] |= groups.pop(j)
+                    merged = True
+                    break
+            if merged:
+                break
+    return groups
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_merge_sets_equals_naive(seed):
+    rnd = random.Random(seed)
+    listOfSets = [set(rnd.sample(range(30), rnd.randint(0, 3))) for _ in range(rnd.randint(0, 20))]
+    result = algorithms.mergeSets(listOfSets)
+    assert sorted(map(sorted, result)) == sorted(map(sorted, naiveMergeSets(listOfSets)))
+
+
+def test_union_find():
+    unionFind = algorithms.UnionFind()
+    for item in range(10):
+        unionFind.add(item)
+    for first, second in ((0, 1), (2, 3), (1, 3), (5, 6)):
+        unionFind.union(first, second)
+    assert unionFind.find(0) == unionFind.find(2)
+    assert unionFind.find(4) == 4 and unionFind.find(5) != unionFind.find(0)
+    # Items missing in the structure are added by the union.
+    assert unionFind.union(10, 11) == unionFind.find(11)
+    assert sorted(map(sorted, unionFind.groups())) == \
+        [[0, 1, 2, 3], [4], [5, 6], [7], [8], [9], [10, 11]]
+
+
+BACKENDS = [backend for backend in solver.BACKENDS if backend != "z3" or solver.HAS_Z3]
+
+
+@pytest.mark.parametrize("seed", range(30))
+@pytest.mark.parametrize("engine", ("pairwise", "refinement", "simulation"))
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_minimization_preserves_language(seed, engine, backend):
+    automaton = randomNfa(seed, states=random.Random(seed).randint(4, 12))
+    original = copyNfa(automaton)
+    algorithms.solverMinimization(automaton, 1 + seed % 2, engine=engine, backend=backend)
+    automaton.cleanDeadStates()
+    checkConsistency(automaton)
+    assert len(automaton.states) <= len(original.states)
+    assert sameLanguage(original, automaton)
+
+
+@pytest.mark.parametrize("seed", range(30))
+@pytest.mark.parametrize("options", ({"expansionBudget": 4},
+                                     {"expansionBudget": 4, "partialExpansion": True},
+                                     {"signatureSteps": 2},
+                                     {"allowSelfLoops": False}))
+def test_minimization_options_preserve_language(seed, options):
+    automaton = randomNfa(seed)
+    original = copyNfa(automaton)
+    algorithms.solverMinimization(automaton, 2, **options)
+    automaton.cleanDeadStates()
+    checkConsistency(automaton)
+    assert sameLanguage(original, automaton)
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_bitset_minimization_equals_set_minimization(seed):
+    original = randomNfa(seed)
+    automaton = copyNfa(original)
+    bitsetAutomaton = copyNfa(original)
+    bitsetAutomaton.bitsetEQ = True
+    algorithms.solverMinimization(automaton, 2)
+    algorithms.solverMinimization(bitsetAutomaton, 2)
+    assert bitsetAutomaton.states == automaton.states
+    assert sameLanguage(original, bitsetAutomaton)
+
+
+def test_parallel_minimization_preserves_language():
+    automaton = randomNfa(7, states=30)
+    original = copyNfa(automaton)
+    algorithms.solverMinimization(automaton, 1, workers=2)
+    automaton.cleanDeadStates()
+    assert sameLanguage(original, automaton)
+
+
+def test_anytime_minimization_preserves_language():
+    automaton = randomNfa(7, states=30)
+    original = copyNfa(automaton)
+    stats = algorithms.solverMinimization(automaton, 1, timeBudget=0, anytime=True)
+    assert stats.counters["budgetExceeded"] == 1
+    with pytest.raises(algorithms.TimeBudgetExceeded):
+        algorithms.solverMinimization(copyNfa(original), 1, timeBudget=0)
+    assert sameLanguage(original, automaton)
@@ -0,0 +1,87 @@
+"""test_clustercache.py
+Tests of the canonical forms of clusters and of the cache of their solutions.
+"""
+
+
+import random
+from itertools import combinations
+import pytest
+import algorithms
+import clustercache
+import solver
+from automata import randomNfa, copyNfa, sameLanguage
+
+
+@pytest.fixture(autouse=True)
+def defaultCache():
+    clustercache.configureCache()
+    yield
+    clustercache.configureCache()
+
+
+def randomCluster(seed, states=7):
+    rnd = random.Random(seed)
+    pairs = [frozenset(pair) for pair in combinations(("q{0}".format(i) for i in range(states)), 2)]
+    return ({pair for pair in pairs if rnd.random() < 0.3},
+            {pair for pair in pairs if rnd.random() < 0.3})
+
+
+def relabel(seed, backwardEq, forwardEq):
+    states = sorted(frozenset().union(*backwardEq, *forwardEq))
+    names = ["r{0}".format(i) for i in range(len(states))]
+    random.Random(seed).shuffle(names)
+    rename = dict(zip(states, names))
+    return ({frozenset(rename[state] for state in pair) for pair in backwardEq},
+            {frozenset(rename[state] for state in pair) for pair in forwardEq})
+
+
+def mergedPairs(backwardEq, forwardEq, solution):
+    backwardTrue, forwardTrue = solution[:2]
+    return sum(pair <= backwardTrue for pair in backwardEq) + \
+        sum(pair <= forwardTrue for pair in forwardEq)
+
+
+def test_cache_is_opt_in():
+    assert clustercache.getCache() is None
+    clustercache.configureCache(16)
+    assert clustercache.getCache() is not None
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_isomorphic_clusters_have_same_key(seed):
+    backwardEq, forwardEq = randomCluster(seed)
+    key, order = clustercache.canonicalForm(backwardEq, forwardEq)
+    renamed = relabel(seed, backwardEq, forwardEq)
+    assert clustercache.canonicalForm(*renamed)[0] == key
+    assert len(order) == len(frozenset().union(*backwardEq, *forwardEq))
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_cached_solution_equals_uncached(seed):
+    backwardEq, forwardEq = randomCluster(seed)
+    renamedBackwardEq, renamedForwardEq = relabel(seed, backwardEq, forwardEq)
+    uncached = solver.BruteForceSolver().solve(renamedBackwardEq, renamedForwardEq)
+
+    clustercache.configureCache(16)
+    algorithms.calculateSolver(backwardEq, forwardEq, backend="bruteforce")
+    algorithms.calculateSolver(renamedBackwardEq, renamedForwardEq, backend="bruteforce")
+    assert clustercache.getCache().hits == 1
+    # The cached solution relabelled to the states of the isomorphic cluster.
+    key, order = clustercache.canonicalForm(renamedBackwardEq, renamedForwardEq)
+    labels = clustercache.getCache().get(key)
+    cached = ({order[label] for label in labels[0]}, {order[label] for label in labels[1]})
+    # Both solutions are optimal (the same count of merged pairs).
+    assert mergedPairs(renamedBackwardEq, renamedForwardEq, cached) == \
+        mergedPairs(renamedBackwardEq, renamedForwardEq, uncached)
+
+
+@pytest.mark.parametrize("seed", range(60))
+def test_cached_minimization_preserves_language(seed):
+    # The cached solutions are optimal as the uncached ones, but they may break
+    # ties differently, so only the language of the results is compared.
+    automaton = randomNfa(seed)
+    original = copyNfa(automaton)
+    clustercache.configureCache(64)
+    algorithms.solverMinimization(automaton, 1)
+    automaton.cleanDeadStates()
+    assert sameLanguage(original, automaton)
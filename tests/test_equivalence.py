@@ -0,0 +1,152 @@
+"""test_equivalence.py
+Tests of the language equivalence approximations (algorithms.statesEQ).
+"""
+
+
+from itertools import combinations
+import random
+import pytest
+import algorithms
+import nfa
+import partition
+from automata import randomNfa, copyNfa, stateAutomaton, sameLanguage
+
+
+def allPairs(automaton, states, lookahead):
+    """Pairwise equivalence without the signature prefilter."""
+    backwardEq = {frozenset(pair) for pair in combinations(states, 2)
+                  if automaton.isBackwardEQ(*pair, steps=lookahead)}
+    forwardEq = {frozenset(pair) for pair in combinations(states, 2)
+                 if automaton.isForwardEQ(*pair, steps=lookahead)}
+    return backwardEq, forwardEq
+
+
+@pytest.mark.parametrize("seed", range(40))
+@pytest.mark.parametrize("signatureSteps", (0, 1, 3))
+def test_signatures_do_not_change_pairs(seed, signatureSteps):
+    automaton = randomNfa(seed)
+    for lookahead in (1, 2):
+        expected = allPairs(automaton, automaton.states, lookahead)
+        assert algorithms.statesEQ(automaton, automaton.states, st=lookahead,
+                                   signatureSteps=signatureSteps) == expected
+
+
+@pytest.mark.parametrize("seed", range(60))
+@pytest.mark.parametrize("engine", ("pairwise", "refinement", "simulation"))
+def test_equivalent_pairs_have_same_language(seed, engine):
+    automaton = randomNfa(seed)
+    for lookahead in (1, 2):
+        backwardEq, forwardEq = algorithms.statesEQ(automaton, automaton.states, st=lookahead,
+                                                    engine=engine)
+        for pairs, forward in ((backwardEq, False), (forwardEq, True)):
+            for r, s in pairs:
+                assert sameLanguage(stateAutomaton(automaton, r, forward),
+                                    stateAutomaton(automaton, s, forward))
+
+
+def test_refinement_is_bounded_bisimulation():
+    # r and s have the same language {a, ab}, but they are not bisimilar:
+    # the successor q of s is accepting and has the transition b,
+    # r has these properties split between p1 and p2.
+    automaton = nfa.Nfa()
+    automaton.addInitialState("i")
+    automaton.addTransitions([("i", "r", "c"), ("i", "s", "c"), ("r", "p1", "a"), ("r", "p2", "a"),
+                              ("s", "q", "a"), ("p2", "f", "b"), ("q", "f", "b")])
+    for state in ("p1", "q", "f"):
+        automaton.addAcceptingState(state)
+
+    pair = frozenset({"r", "s"})
+    assert pair in algorithms.statesEQ(automaton, {"r", "s"}, st=2)[1]
+    assert pair not in partition.refinementEQ(automaton, {"r", "s"}, steps=2)[1]
+    assert pair not in partition.refinementEQ(automaton, {"r", "s"}, steps=10)[1]
+
+
+def test_refinement_pairs_are_bisimilar():
+    # The successors of r and s are bisimilar.
+    automaton = nfa.Nfa()
+    automaton.addInitialState("i")
+    automaton.addTransitions([("i", "r", "c"), ("i", "s", "c"), ("r", "p", "a"),
+                              ("s", "q", "a"), ("p", "f", "b"), ("q", "f", "b")])
+    automaton.addAcceptingState("f")
+    # The successors p and q are refined (distance 1), the state f is the boundary.
+    assert frozenset({"r", "s"}) in partition.refinementEQ(automaton, {"r", "s"}, steps=1)[1]
+    # With the lookahead 0 the successors are the distinct boundary.
+    assert frozenset({"r", "s"}) not in partition.refinementEQ(automaton, {"r", "s"}, steps=0)[1]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_cached_results_equal_uncached(seed):
+    automaton = randomNfa(seed)
+    uncached = randomNfa(seed)
+    automaton.eqCacheSize = 3
+    uncached.eqCacheSize = 0
+    for _ in range(2):
+        assert algorithms.statesEQ(automaton, automaton.states, st=2) == \
+            algorithms.statesEQ(uncached, uncached.states, st=2)
+    assert uncached.eqCacheHits == 0
+
+
+def test_eq_cache_evicts_least_recently_used():
+    automaton = randomNfa(7, states=30)
+    automaton.eqCacheSize = 2
+    first, second, third = combinations(sorted(automaton.states)[:3], 2)
+
+    def misses(pair):
+        before = automaton.eqCacheMisses
+        automaton.isForwardEQ(*pair, steps=2)
+        return automaton.eqCacheMisses - before
+
+    assert [misses(first), misses(second), misses(first)] == [1, 1, 0]
+    # The second pair is the least recently used one, it is evicted by the third one.
+    assert [misses(third), misses(first), misses(second)] == [1, 0, 1]
+    # Backward results have their own entries.
+    assert automaton.isBackwardEQ(*first, steps=2) is not None and automaton.eqCacheMisses == 5
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_eq_cache_is_invalidated_by_changes(seed):
+    rnd = random.Random(seed)
+    automaton = randomNfa(seed, states=12)
+    for _ in range(10):
+        pairs = list(combinations(sorted(automaton.states), 2))
+        for lookahead in (1, 2):
+            # Results of the edited automaton (cached where the states were not changed)
+            # must equal the results of a fresh automaton.
+            fresh = copyNfa(automaton)
+            for r, s in pairs:
+                assert automaton.isForwardEQ(r, s, lookahead) == fresh.isForwardEQ(r, s, lookahead)
+                assert automaton.isBackwardEQ(r, s, lookahead) == fresh.isBackwardEQ(r, s, lookahead)
+        existing = sorted((fromS, toS, byL) for fromS in automaton.forwardTrans
+                          for byL in automaton.forwardTrans[fromS]
+                          for toS in automaton.forwardTrans[fromS][byL])
+        if existing and rnd.random() < 0.5:
+            automaton.pruneTransition(*rnd.choice(existing))
+        else:
+            automaton.addTransition(str(rnd.randrange(12)), str(rnd.randrange(12)), rnd.choice("ab"))
+    assert automaton.eqCacheHits > 0
+
+
+@pytest.mark.parametrize("seed", range(60))
+def test_bitset_bfs_equals_set_bfs(seed):
+    automaton = randomNfa(seed)
+    bitsetAutomaton = randomNfa(seed)
+    bitsetAutomaton.bitsetEQ = True
+    for lookahead in (1, 2, 3):
+        assert algorithms.statesEQ(bitsetAutomaton, bitsetAutomaton.states, st=lookahead) == \
+            algorithms.statesEQ(automaton, automaton.states, st=lookahead)
+
+
+def test_bitset_ids_do_not_grow():
+    automaton = randomNfa(7, states=30)
+    automaton.bitsetEQ = True
+    original = copyNfa(automaton)
+    for _ in range(100):
+        # New states replace the old ones, the count of states stays the same.
+        automaton.quotient([{state} for state in automaton.states])
+        for state in sorted(automaton.states):
+            automaton.mergeStates({state})
+        backwardEq, forwardEq = algorithms.statesEQ(automaton, automaton.states, st=2)
+        assert automaton.bitsetIdCount() <= 2 * len(automaton.states) + 64
+    assert sameLanguage(original, automaton)
+    automaton.bitsetEQ = False
+    assert algorithms.statesEQ(automaton, automaton.states, st=2) == (backwardEq, forwardEq)
@@ -0,0 +1,230 @@
+"""test_nfa.py
+Tests of the operations of Nfa: merging of states (quotient), incremental
+families and removal of dead states (cleanDeadStates, pruneState).
+"""
+
+
+import random
+import sys
+import pytest
+import algorithms
+import nfa
+from automata import randomNfa, copyNfa, sameLanguage, checkConsistency
+
+
+def transitions(automaton):
+    return {(fromS, toS, byL) for fromS in automaton.forwardTrans
+            for byL in automaton.forwardTrans[fromS] for toS in automaton.forwardTrans[fromS][byL]}
+
+
+@pytest.mark.parametrize("seed", range(80))
+def test_quotient_equals_merge_states(seed):
+    automaton = randomNfa(seed)
+    # Groups of forward equivalent states.
+    _, forwardEq = algorithms.statesEQ(automaton, automaton.states, st=2)
+    groups = [group for group in algorithms.mergeSets(list(forwardEq)) if len(group) > 1]
+    quotiented = copyNfa(automaton)
+    merged = copyNfa(automaton)
+
+    quotiented.quotient(groups)
+    for group in groups:
+        merged.mergeStates(set(group))
+    checkConsistency(quotiented)
+    assert sameLanguage(automaton, quotiented)
+    # The new states have the same names (in the order of the groups).
+    assert quotiented.states == merged.states
+    assert transitions(quotiented) == transitions(merged)
+    assert quotiented.initialStates == merged.initialStates
+    assert quotiented.acceptingStates == merged.acceptingStates
+
+
+def test_transitions_inside_group_become_self_loops():
+    # Language a*: the states p and q have the same forward language.
+    automaton = nfa.Nfa()
+    automaton.addInitialState("p")
+    automaton.addTransitions([("p", "q", "a"), ("q", "p", "a")])
+    automaton.addAcceptingState("p")
+    automaton.addAcceptingState("q")
+    quotiented = copyNfa(automaton)
+    merged = copyNfa(automaton)
+
+    newState, = quotiented.quotient([{"p", "q"}])
+    assert transitions(quotiented) == {(newState, newState, "a")}
+    assert sameLanguage(automaton, quotiented)
+    newState = merged.mergeStates({"p", "q"})
+    assert transitions(merged) == {(newState, newState, "a")}
+
+
+def neighbours(automaton, state):
+    return {target for trans in (automaton.forwardTrans, automaton.backwardTrans)
+            for targets in trans.get(state, dict()).values() for target in targets}
+
+
+def familyGroups(automaton, allowSelfLoops):
+    """Groups of the family states by the definition: successors (ancestors)
+    of a center reached by one letter, the groups with common states are joined."""
+    centerFamilies = list()
+    for trans in (automaton.forwardTrans, automaton.backwardTrans):
+        for center, letters in trans.items():
+            members = set()
+            for targets in letters.values():
+                if len(targets - {center}) > 1:
+                    members.update(targets - {center})
+            if not allowSelfLoops:
+                members = {state for state in members if state in automaton.forwardTrans
+                           and not any(state in targets
+                                       for targets in automaton.forwardTrans[state].values())}
+            if len(members) > 1:
+                centerFamilies.append(members)
+    return [frozenset(group) for group in algorithms.mergeSets(centerFamilies)]
+
+
+def familyGroup(automaton, groups, family):
+    """Function asserts that the family is a maximal set of not neighbouring states
+    of one group and returns the group."""
+    group, = [group for group in groups if family <= group]
+    assert len(family) > 1
+    for state in group:
+        blocked = any(state in neighbours(automaton, member) for member in family - {state})
+        assert blocked != (state in family)
+    return group
+
+
+def randomEdit(automaton, rnd):
+    states = sorted(automaton.states)
+    edit = rnd.random()
+    if edit < 0.4 or len(states) < 3:
+        # Removed states may come back.
+        automaton.addTransition(str(rnd.randrange(20)), str(rnd.randrange(20)), rnd.choice("ab"))
+    elif edit < 0.7:
+        existing = sorted(transitions(automaton))
+        if existing:
+            automaton.pruneTransition(*rnd.choice(existing))
+    elif edit < 0.85:
+        automaton.mergeStates(set(rnd.sample(states, 2)))
+    else:
+        automaton.pruneState(rnd.choice(states))
+
+
+@pytest.mark.parametrize("seed", range(40))
+@pytest.mark.parametrize("allowSelfLoops", (True, False))
+def test_incremental_families_match_full_rescan(seed, allowSelfLoops):
+    rnd = random.Random(seed)
+    automaton = randomNfa(seed, states=20)
+    # The latest family returned by the incremental calls for each group.
+    tracked = dict()
+    for _ in range(15):
+        rollback = rnd.random() < 0.2
+        if rollback:
+            automaton.beginTransaction()
+        for _ in range(rnd.randint(1, 4)):
+            randomEdit(automaton, rnd)
+        if rollback:
+            automaton.rollbackTransaction()
+
+        groups = familyGroups(automaton, allowSelfLoops)
+        for family in automaton.getFamilies(allowSelfLoops=allowSelfLoops, incremental=True):
+            tracked[familyGroup(automaton, groups, family)] = family
+        for family in automaton.getFamilies(allowSelfLoops=allowSelfLoops):
+            group = familyGroup(automaton, groups, family)
+            # The choice of the not neighbouring states depends on the order of the
+            # states. If no state neighbours all others, each choice has two states
+            # at least, so the group must be returned by the incremental calls too.
+            if any(all(other in neighbours(automaton, state) for other in group - {state})
+                   for state in group):
+                continue
+            assert group in tracked
+            assert familyGroup(automaton, groups, tracked[group]) == group
+
+
+def rawNfa(seed, states=15):
+    """Random automaton with the dead states."""
+    rnd = random.Random(seed)
+    automaton = nfa.Nfa()
+    for state in rnd.sample(range(states), 2):
+        automaton.addInitialState(str(state))
+    for _ in range(int(states * rnd.uniform(0.8, 2.0))):
+        automaton.addTransition(str(rnd.randrange(states)), str(rnd.randrange(states)), rnd.choice("ab"))
+    for state in rnd.sample(range(states), 2):
+        automaton.addAcceptingState(str(state))
+    # Isolated states.
+    automaton.states.update(str(state) for state in range(states, states + 2))
+    return automaton
+
+
+def snapshot(automaton):
+    return (set(automaton.states), set(automaton.initialStates), set(automaton.acceptingStates),
+            transitions(automaton),
+            {state: (automaton.inDegree(state), automaton.outDegree(state)) for state in automaton.states})
+
+
+def liveStates(automaton):
+    """States reachable from an initial state and reaching an accepting state."""
+    def reachable(starts, trans):
+        seen = set(starts)
+        stack = list(starts)
+        while stack:
+            for targets in trans.get(stack.pop(), dict()).values():
+                stack.extend(targets - seen)
+                seen.update(targets)
+        return seen
+    return reachable(automaton.initialStates, automaton.forwardTrans) & \
+        reachable(automaton.acceptingStates, automaton.backwardTrans)
+
+
+@pytest.mark.parametrize("seed", range(80))
+def test_clean_dead_states_in_transaction(seed):
+    original = rawNfa(seed)
+    swept = copyNfa(original)
+    swept.cleanDeadStates()
+    checkConsistency(swept)
+    assert swept.states == liveStates(original)
+    assert sameLanguage(original, swept)
+
+    # In the open transaction the states are pruned one by one (pruneState).
+    pruned = copyNfa(original)
+    pruned.beginTransaction()
+    pruned.cleanDeadStates()
+    checkConsistency(pruned)
+    assert snapshot(pruned) == snapshot(swept)
+    pruned.commitTransaction()
+    assert snapshot(pruned) == snapshot(swept)
+
+    rolledBack = copyNfa(original)
+    rolledBack.beginTransaction()
+    rolledBack.cleanDeadStates()
+    rolledBack.rollbackTransaction()
+    checkConsistency(rolledBack)
+    assert snapshot(rolledBack) == snapshot(original)
+
+
+def chainAutomaton(length):
+    """Automaton i -a-> f with a dead end chain i -> c0 -> ... and an unreachable
+    chain h0 -> ... -> f, both of the given length."""
+    automaton = nfa.Nfa()
+    automaton.addInitialState("i")
+    automaton.addAcceptingState("f")
+    automaton.addTransition("i", "f", "a")
+    chain = ["i"] + ["c{0}".format(index) for index in range(length)]
+    heads = ["h{0}".format(index) for index in range(length)] + ["f"]
+    automaton.addTransitions((fromS, toS, "a") for states in (chain, heads)
+                             for fromS, toS in zip(states, states[1:]))
+    return automaton
+
+
+@pytest.mark.parametrize("transaction", (False, True))
+def test_prune_chain_longer_than_recursion_limit(transaction):
+    length = sys.getrecursionlimit() + 100
+    automaton = chainAutomaton(length)
+    before = snapshot(automaton)
+    if transaction:
+        automaton.beginTransaction()
+    # The whole chains are pruned by the cascade.
+    automaton.pruneState("c{0}".format(length - 1))
+    automaton.pruneState("h0")
+    checkConsistency(automaton)
+    assert automaton.states == {"i", "f"}
+    assert transitions(automaton) == {("i", "f", "a")}
+    if transaction:
+        automaton.rollbackTransaction()
+        assert snapshot(automaton) == before
@@ -0,0 +1,202 @@
+"""test_parse.py
+Tests of the parsers (parse.py). The parsers must accept the same files as
+the original line by line parsers.
+"""
+
+
+import random
+import re
+import pytest
+import nfa
+import parse
+
+
+def lineParseBa(fileName):
+    """Original line by line parser of the BA format."""
+    automaton = nfa.Nfa()
+    wasEndOfInitalStates = False
+    with open(fileName, 'r') as fh:
+        for line in fh:
+            line = line.rstrip()
+            if re.fullmatch(r"\[\w+\]", line) is not None:
+                newState = re.search(r"\[(\w+)\]", line).group(1)
+                if wasEndOfInitalStates:
+                    automaton.acceptingStates.add(newState)
+                else:
+                    automaton.initialStates.add(newState)
+                automaton.states.add(newState)
+            elif re.fullmatch(r"\w+[ ]*\,[ ]*\[\w+\][ ]*\->[ ]*\[\w+\]", line) is not None:
+                result = re.search(r"(\w+)[ ]*\,[ ]*\[(\w+)\][ ]*\->[ ]*\[(\w+)\]", line)
+                automaton.addTransition(result.group(2), result.group(3), result.group(1))
+                wasEndOfInitalStates = True
+    return automaton
+
+
+def lineParseTimbuk(fileName):
+    """Original line by line parser of the Timbuk format."""
+    automaton = nfa.Nfa()
+    with open(fileName, 'r') as fh:
+        for line in fh:
+            line = line.rstrip()
+            if re.fullmatch(r"\w+(\(\))?[ ]*\->[ ]*\w+", line) is not None:
+                newState = re.search(r"\w+(\(\))?[ ]*\->[ ]*(\w+)", line).group(2)
+                automaton.initialStates.add(newState)
+                automaton.states.add(newState)
+            elif re.fullmatch(r"\w+\(\w+\)[ ]*\->[ ]*\w+", line) is not None:
+                result = re.search(r"(\w+)\((\w+)\)[ ]*\->[ ]*(\w+)", line)
+                automaton.addTransition(result.group(2), result.group(3), result.group(1))
+            else:
+                words = line.split()
+                if words and words[0] == "Final":
+                    automaton.acceptingStates.update(words[2:])
+                    automaton.states.update(words[2:])
+    return automaton
+
+
+def writeFile(tmp_path, content, name="input"):
+    fileName = str(tmp_path / name)
+    # The content is written as it is (no translation of line ends).
+    with open(fileName, 'w', newline='') as fh:
+        fh.write(content)
+    return fileName
+
+
+def assertSameAutomaton(automaton, expected):
+    assert automaton.states == expected.states
+    assert automaton.initialStates == expected.initialStates
+    assert automaton.acceptingStates == expected.acceptingStates
+    assert automaton.forwardTrans == expected.forwardTrans
+    assert automaton.backwardTrans == expected.backwardTrans
+
+
+def test_ba_initial_and_accepting_states(tmp_path):
+    fileName = writeFile(tmp_path, "[q0]\n[q1]\na,[q0]->[q2]\n[q3]\nb,[q2]->[q3]\n[q4]\n")
+    automaton = parse.parseBa(fileName)
+    # States before the first transition are initial, all states after it are accepting.
+    assert automaton.initialStates == {"q0", "q1"}
+    assert automaton.acceptingStates == {"q3", "q4"}
+    assert automaton.states == {"q0", "q1", "q2", "q3", "q4"}
+    assert automaton.forwardTrans == {"q0": {"a": {"q2"}}, "q2": {"b": {"q3"}}}
+
+
+def test_ba_without_transitions(tmp_path):
+    automaton = parse.parseBa(writeFile(tmp_path, "[q0]\n[q1]\n"))
+    assert automaton.initialStates == {"q0", "q1"}
+    assert not automaton.acceptingStates
+
+
+def test_timbuk_final_states(tmp_path):
+    fileName = writeFile(tmp_path, "Ops a:1 x:0\nAutomaton A\nStates q0 q1 q2\n"
+                                   "Final States q1 q2\nTransitions\nx -> q0\n"
+                                   "a(q0) -> q1\na(q1) -> q2\n")
+    automaton = parse.parseTimbuk(fileName)
+    assert automaton.initialStates == {"q0"}
+    assert automaton.acceptingStates == {"q1", "q2"}
+    assert automaton.forwardTrans == {"q0": {"a": {"q1"}}, "q1": {"a": {"q2"}}}
+
+
+def test_timbuk_final_lines(tmp_path):
+    # Every "Final ..." line adds its states from the third word, "Final -> q"
+    # is an initial state and "Finals" is not a final line.
+    fileName = writeFile(tmp_path, "Final States q1\n  Final States q2 q3  \nFinal\n"
+                                   "Final -> q0\nFinals States q4\n")
+    automaton = parse.parseTimbuk(fileName)
+    assert automaton.acceptingStates == {"q1", "q2", "q3"}
+    assert automaton.initialStates == {"q0"}
+    assertSameAutomaton(automaton, lineParseTimbuk(fileName))
+
+
+@pytest.mark.parametrize("lineEnd", ("\n", "\r\n"))
+@pytest.mark.parametrize("finalNewline", (True, False))
+def test_ba_line_format(tmp_path, lineEnd, finalNewline):
+    lines = ["", "[q0]  ", "\t", "a , [q0] -> [q1]\t", " [q5]", "b,[q1]->[q2]", "", "[q2] "]
+    content = lineEnd.join(lines) + (lineEnd if finalNewline else "")
+    fileName = writeFile(tmp_path, content)
+    automaton = parse.parseBa(fileName)
+    # Leading white spaces are not allowed, trailing ones are.
+    assert automaton.initialStates == {"q0"}
+    assert automaton.acceptingStates == {"q2"}
+    assert automaton.states == {"q0", "q1", "q2"}
+    assertSameAutomaton(automaton, lineParseBa(fileName))
+
+
+@pytest.mark.parametrize("lineEnd", ("\n", "\r\n"))
+@pytest.mark.parametrize("finalNewline", (True, False))
+def test_timbuk_line_format(tmp_path, lineEnd, finalNewline):
+    lines = ["Ops a:1 x:0", "", "Final States q2 ", "x() -> q0  ", " a(q5) -> q6",
+             "a(q0)->q1", "", "a(q1) -> q2\t"]
+    content = lineEnd.join(lines) + (lineEnd if finalNewline else "")
+    fileName = writeFile(tmp_path, content)
+    automaton = parse.parseTimbuk(fileName)
+    assert automaton.initialStates == {"q0"}
+    assert automaton.acceptingStates == {"q2"}
+    assert automaton.states == {"q0", "q1", "q2"}
+    assertSameAutomaton(automaton, lineParseTimbuk(fileName))
+
+
+def randomLines(rnd, templates):
+    lines = list()
+    for _ in range(rnd.randint(0, 30)):
+        line = rnd.choice(templates).format(*("q{0}".format(rnd.randrange(6)) for _ in range(3)),
+                                           letter=rnd.choice("ab"))
+        if rnd.random() < 0.1:
+            line = rnd.choice((" ", "\t")) + line
+        if rnd.random() < 0.3:
+            line += rnd.choice((" ", "\t", "  \t"))
+        lines.append(line)
+    lineEnd = rnd.choice(("\n", "\r\n"))
+    return lineEnd.join(lines) + rnd.choice((lineEnd, ""))
+
+
+BA_LINES = ("[{0}]", "{letter},[{0}]->[{1}]", "{letter} , [{0}] -> [{1}]", "", "   ",
+            "[{0}] [{1}]", "{letter},[{0}]-[{1}]", "{0}")
+TIMBUK_LINES = ("Ops a:1 b:1 x:0", "Automaton A", "States {0} {1}", "Final States {0} {1}",
+                "Final States", "Final {0}", "Transitions", "x -> {0}", "x() -> {0}",
+                "{letter}({0}) -> {1}", "{letter}({0})->{1}", "", "  ", "{letter}({0} -> {1}",
+                "Final -> {0}", "Final({0}) -> {1}")
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_ba_equals_line_parser(tmp_path, seed):
+    fileName = writeFile(tmp_path, randomLines(random.Random(seed), BA_LINES))
+    assertSameAutomaton(parse.parseBa(fileName), lineParseBa(fileName))
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_timbuk_equals_line_parser(tmp_path, seed):
+    fileName = writeFile(tmp_path, randomLines(random.Random(seed), TIMBUK_LINES))
+    assertSameAutomaton(parse.parseTimbuk(fileName), lineParseTimbuk(fileName))
+
+
+def raisedError(function, fileName):
+    try:
+        function(fileName)
+    except Exception as exception:
+        return type(exception)
+    return None
+
+
+@pytest.mark.parametrize("function, lineFunction", ((parse.parseBa, lineParseBa),
+                                                    (parse.parseTimbuk, lineParseTimbuk)))
+def test_bad_files_raise_the_same_errors(tmp_path, function, lineFunction):
+    binary = str(tmp_path / "binary")
+    with open(binary, 'wb') as fh:
+        fh.write(b"[q0]\nx -> q0\n\xff\xfe\x80\n")
+    for fileName in (str(tmp_path / "missing"), str(tmp_path), binary):
+        assert raisedError(function, fileName) is raisedError(lineFunction, fileName)
+    assert raisedError(function, str(tmp_path / "missing")) is FileNotFoundError
+
+
+def test_parsing_stats(tmp_path):
+    stats = dict()
+    parse.parseBa(writeFile(tmp_path, "[q0]\r\na,[q0]->[q1]\r\n\r\n[q1]"), stats=stats)
+    assert set(stats) == {"lines", "seconds", "linesPerSecond"}
+    # The last line without the line end is counted.
+    assert stats["lines"] == 4
+    assert stats["seconds"] >= 0 and stats["linesPerSecond"] > 0
+    stats = dict()
+    parse.parseTimbuk(writeFile(tmp_path, "x -> q0\na(q0) -> q1\nFinal States q1\n"), stats=stats)
+    assert stats["lines"] == 3
+    stats = dict()
+    parse.parseBa(writeFile(tmp_path, ""), stats=stats)
+    assert stats["lines"] == 0
@@ -0,0 +1,74 @@
+"""test_partition.py
+Tests of the partition refinement (partition.py).
+"""
+
+
+import pytest
+import partition
+from automata import randomNfa, copyNfa, sameLanguage, checkConsistency
+
+
+def naiveBisimulation(trans, flaggedStates, states):
+    """Greatest bisimulation by the definition (as the set of pairs)."""
+    relation = {(r, s) for r in states for s in states
+                if (r in flaggedStates) == (s in flaggedStates)}
+
+    def matched(r, s):
+        letters = set(trans.get(r, dict())) | set(trans.get(s, dict()))
+        return all(all(any((rTarget, sTarget) in relation
+                           for sTarget in trans.get(s, dict()).get(letter, ()))
+                       for rTarget in trans.get(r, dict()).get(letter, ()))
+                   for letter in letters)
+
+    changed = True
+    while changed:
+        changed = False
+        for r, s in list(relation):
+            if not (matched(r, s) and matched(s, r)):
+                relation.discard((r, s))
+                relation.discard((s, r))
+                changed = True
+    return relation
+
+
+@pytest.mark.parametrize("seed", range(60))
+@pytest.mark.parametrize("forward", (True, False))
+def test_bisimulation_classes_equal_naive(seed, forward):
+    automaton = randomNfa(seed)
+    if forward:
+        trans, predTrans, flaggedStates = automaton.forwardTrans, automaton.backwardTrans, \
+            automaton.acceptingStates
+    else:
+        trans, predTrans, flaggedStates = automaton.backwardTrans, automaton.forwardTrans, \
+            automaton.initialStates
+    classes = partition.bisimulationClasses(trans, predTrans, flaggedStates, automaton.states)
+    pairs = {(r, s) for block in classes for r in block for s in block}
+    pairs.update((state, state) for state in automaton.states)
+    assert pairs == naiveBisimulation(trans, flaggedStates, automaton.states)
+
+
+@pytest.mark.parametrize("seed", range(60))
+def test_refined_partition_is_stable(seed):
+    automaton = randomNfa(seed)
+    states = automaton.states
+    blocks = partition.refinePartition([states & automaton.acceptingStates,
+                                        states - automaton.acceptingStates],
+                                       automaton.backwardTrans)
+    assert sorted(state for block in blocks for state in block) == sorted(states)
+    blockOf = {state: index for index, block in enumerate(blocks) for state in block}
+    # States of one block lead into the same blocks by each letter.
+    for block in blocks:
+        signatures = {frozenset((letter, blockOf[target])
+                                for letter, targets in automaton.forwardTrans.get(state, dict()).items()
+                                for target in targets) for state in block}
+        assert len(signatures) == 1
+
+
+@pytest.mark.parametrize("seed", range(60))
+def test_bisimulation_reduction_preserves_language(seed):
+    automaton = randomNfa(seed)
+    original = copyNfa(automaton)
+    removed = partition.bisimulationReduction(automaton)
+    checkConsistency(automaton)
+    assert removed == len(original.states) - len(automaton.states)
+    assert sameLanguage(original, automaton)
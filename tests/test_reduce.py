@@ -0,0 +1,108 @@
+"""test_reduce.py
+Tests of the reduction of files (reduce.py).
+"""
+
+
+import csv
+import json
+import os
+import sys
+import parse
+import reduce
+from reduce import SUMMARY_FIELDS
+from automata import randomNfa, sameLanguage
+
+
+def writeAutomaton(tmp_path, seed, states):
+    automaton = randomNfa(seed, states=states)
+    fileName = str(tmp_path / "input.ba")
+    reduce.automatonToFile(automaton, True, fileName)
+    return automaton, fileName
+
+
+def test_exceeded_budget_saves_partial_result(tmp_path):
+    automaton, fileName = writeAutomaton(tmp_path, 7, 30)
+    result = reduce.reduceFile(fileName, True, 1, timeBudget=0)
+    assert result["partial"]
+    assert result["error"].startswith("TimeBudgetExceeded")
+    assert result["output"] == str(tmp_path / "input-1_solver.ba")
+    assert sameLanguage(automaton, parse.parseBa(result["output"]))
+
+
+def test_anytime_has_no_error(tmp_path):
+    _, fileName = writeAutomaton(tmp_path, 7, 30)
+    result = reduce.reduceFile(fileName, True, 1, timeBudget=0, anytime=True)
+    assert result["partial"] and result["error"] is None
+
+
+def test_reduction_preserves_language(tmp_path):
+    automaton, fileName = writeAutomaton(tmp_path, 4, 15)
+    result = reduce.reduceFile(fileName, True, 1)
+    assert not result["partial"] and result["error"] is None
+    assert result["statesAfter"] <= result["statesBefore"]
+    assert sameLanguage(automaton, parse.parseBa(result["output"]))
+
+
+def writeBatch(tmp_path):
+    """Directory with two BA automata, one Timbuk automaton (in a subdirectory)
+    and one file, which cannot be parsed."""
+    (tmp_path / "sub").mkdir()
+    automata = dict()
+    for seed, name, ba in ((4, "first.ba", True), (5, "second.ba", True), (9, "sub/third.timbuk", False)):
+        automata[str(tmp_path / name)] = randomNfa(seed, states=12)
+        reduce.automatonToFile(automata[str(tmp_path / name)], ba, str(tmp_path / name))
+    with open(str(tmp_path / "broken.ba"), "wb") as fh:
+        fh.write(b"[q0]\n\xff\xfe\n")
+    return automata
+
+
+def checkBatchResults(results, automata):
+    """The summaries of the reduced automata (the values read from CSV are strings)."""
+    assert sorted(result["file"] for result in results) == sorted(automata)
+    for result in results:
+        assert not result["error"]
+        # The result is saved next to the input.
+        name, extension = os.path.splitext(result["file"])
+        assert result["output"] == "{0}-1_solver{1}".format(name, extension)
+        parser = parse.parseBa if extension == ".ba" else parse.parseTimbuk
+        assert sameLanguage(automata[result["file"]], parser(result["output"]))
+
+
+def test_batch_directory(tmp_path, monkeypatch, capsys):
+    automata = writeBatch(tmp_path)
+    summary = str(tmp_path / "summary.csv")
+    monkeypatch.setattr(sys, "argv", ["reduce.py", str(tmp_path), "1", "--batch", "-j", "2",
+                                      "--summary", summary])
+    reduce.main()
+    with open(summary, newline="") as fh:
+        rows = list(csv.DictReader(fh))
+    assert tuple(rows[0]) == SUMMARY_FIELDS
+    broken = str(tmp_path / "broken.ba")
+    assert [row["file"] for row in rows] == sorted(list(automata) + [broken])
+    # The failing file is in the summary and the other files are reduced.
+    failed = [row for row in rows if row["file"] == broken]
+    assert failed[0]["error"].startswith("UnicodeDecodeError") and not failed[0]["output"]
+    checkBatchResults([row for row in rows if row["file"] != broken], automata)
+    # The results of the previous run are skipped.
+    assert reduce.batchFiles(str(tmp_path)) == sorted(list(automata) + [broken])
+    assert capsys.readouterr().out == ""
+
+
+def test_batch_manifest(tmp_path, monkeypatch):
+    automata = writeBatch(tmp_path)
+    missing = str(tmp_path / "missing.ba")
+    with open(str(tmp_path / "manifest"), "w") as fh:
+        fh.write("# automata\nfirst.ba\n\n  sub/third.timbuk  \n{0}\nmissing.ba\n".format(
+            tmp_path / "second.ba"))
+    summary = str(tmp_path / "summary.json")
+    monkeypatch.setattr(sys, "argv", ["reduce.py", str(tmp_path / "manifest"), "1", "--batch",
+                                      "-j", "2", "--summary", summary])
+    reduce.main()
+    with open(summary) as fh:
+        results = json.load(fh)
+    for result in results:
+        assert set(SUMMARY_FIELDS) <= set(result)
+    failed = [result for result in results if result["error"] is not None]
+    assert [result["file"] for result in failed] == [missing]
+    assert failed[0]["error"].startswith("FileNotFoundError")
+    checkBatchResults([result for result in results if result["file"] != missing], automata)
@@ -0,0 +1,162 @@
+"""test_simulation.py
+Tests of the simulation preorder and of the simulation equivalence engine.
+"""
+
+
+import random
+import pytest
+import algorithms
+import simulation
+from automata import randomNfa, copyNfa, sameLanguage, checkConsistency
+
+
+def naivePreorder(trans, flaggedStates, states):
+    """Greatest fixpoint of the simulation by the definition."""
+    relation = {(q, r) for q in states for r in states
+                if q not in flaggedStates or r in flaggedStates}
+    changed = True
+    while changed:
+        changed = False
+        for q, r in list(relation):
+            if not all(any((target, other) in relation
+                           for other in trans.get(r, dict()).get(letter, ()))
+                       for letter, targets in trans.get(q, dict()).items() for target in targets):
+                relation.discard((q, r))
+                changed = True
+    return relation
+
+
+def isSimulation(trans, flaggedStates, relation):
+    """Test of the definition of the simulation (not of its maximality)."""
+    return all((q not in flaggedStates or r in flaggedStates) and
+               all(any((target, other) in relation for other in trans.get(r, dict()).get(letter, ()))
+                   for letter, targets in trans.get(q, dict()).items() for target in targets)
+               for q, r in relation)
+
+
+def pairs(preorder):
+    return {(q, r) for q, simulating in preorder.items() for r in simulating}
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_preorder_is_naive_fixpoint(seed):
+    rnd = random.Random(seed)
+    states = {str(i) for i in range(rnd.randint(1, 9))}
+    forward, backward = dict(), dict()
+    for _ in range(rnd.randint(0, 3 * len(states))):
+        fromS, toS = rnd.choice(sorted(states)), rnd.choice(sorted(states))
+        letter = rnd.choice("ab")
+        forward.setdefault(fromS, dict()).setdefault(letter, set()).add(toS)
+        backward.setdefault(toS, dict()).setdefault(letter, set()).add(fromS)
+    flaggedStates = {state for state in states if rnd.random() < 0.3}
+
+    preorder = simulation.simulationPreorder(forward, backward, flaggedStates, states)
+    assert pairs(preorder) == naivePreorder(forward, flaggedStates, states)
+
+
+def transitionSet(automaton):
+    return {(fromS, toS, byL) for fromS in automaton.forwardTrans
+            for byL in automaton.forwardTrans[fromS] for toS in automaton.forwardTrans[fromS][byL]}
+
+
+def randomChange(automaton, rnd):
+    states = sorted(automaton.states)
+    fromS, toS = rnd.choice(states), rnd.choice(states)
+    if rnd.random() < 0.5:
+        automaton.addTransition(fromS, toS, rnd.choice("ab"))
+    else:
+        automaton.pruneState(fromS)
+
+
+def equivalenceClasses(preorder, states):
+    """Classes of the states simulating each other (as the set of pairs)."""
+    return {(q, r) for q in states for r in states if (q, r) in preorder and (r, q) in preorder}
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_updated_relation_is_simulation(seed):
+    automaton = randomNfa(seed)
+    directions = ((automaton.backwardTrans, automaton.forwardTrans, automaton.initialStates),
+                  (automaton.forwardTrans, automaton.backwardTrans, automaton.acceptingStates))
+    relations = list()
+    for trans, predTrans, flaggedStates in directions:
+        relation = simulation.Simulation()
+        relation.compute(trans, predTrans, flaggedStates, automaton.states)
+        relations.append(relation)
+    rnd = random.Random(seed)
+    for _ in range(5):
+        if len(automaton.states) < 2:
+            break
+        before = (transitionSet(automaton), set(automaton.states))
+        randomChange(automaton, rnd)
+        # States of the changed transitions and the removed states.
+        changed = before[0] ^ transitionSet(automaton)
+        touched = {state for fromS, toS, _ in changed for state in (fromS, toS)} | \
+            (before[1] - automaton.states)
+        for relation, (trans, predTrans, flaggedStates) in zip(relations, directions):
+            relation.update(trans, predTrans, flaggedStates, automaton.states, touched)
+
+    for relation, (trans, _, flaggedStates) in zip(relations, directions):
+        updated = {(q, relation.order[j]) for q, i in relation.index.items()
+                   for j in simulation.bits(relation.sim[i])}
+        assert isSimulation(trans, flaggedStates, updated)
+        # The refined relation is a subset of the maximal one.
+        assert updated <= naivePreorder(trans, flaggedStates, automaton.states)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_updated_classes_are_simulation_equivalent(seed):
+    automaton = randomNfa(seed)
+    automaton.simulationClasses()
+    rnd = random.Random(seed)
+    changes = 0
+    for _ in range(5):
+        if len(automaton.states) < 2:
+            break
+        randomChange(automaton, rnd)
+        changes += 1
+        backward, forward = automaton.simulationClasses()
+        assert set(backward) == automaton.states == set(forward)
+
+    backward, forward = automaton.simulationClasses()
+    directions = ((backward, automaton.backwardTrans, automaton.initialStates),
+                  (forward, automaton.forwardTrans, automaton.acceptingStates))
+    for classes, trans, flaggedStates in directions:
+        maximal = equivalenceClasses(naivePreorder(trans, flaggedStates, automaton.states),
+                                     automaton.states)
+        # The classes of the refined relations may be finer than the maximal ones.
+        assert {(q, r) for q in classes for r in classes if classes[q] == classes[r]} <= maximal
+    assert automaton.simulationUpdates == changes and automaton.simulationComputations == 1
+
+    # The reset relations are maximal again.
+    automaton.resetSimulation()
+    for (_, trans, flaggedStates), classes in zip(directions, automaton.simulationClasses()):
+        maximal = equivalenceClasses(naivePreorder(trans, flaggedStates, automaton.states),
+                                     automaton.states)
+        assert {(q, r) for q in classes for r in classes if classes[q] == classes[r]} == maximal
+    assert automaton.simulationComputations == 2
+
+
+def test_removed_states_are_skipped():
+    automaton = randomNfa(3, states=12)
+    family = set(automaton.states)
+    victim = sorted(family)[0]
+    automaton.pruneState(victim)
+    backwardEq, forwardEq = algorithms.statesEQ(automaton, family, engine="simulation")
+    assert all(pair <= automaton.states for pair in backwardEq | forwardEq)
+
+
+def test_relation_is_computed_once_per_round():
+    automaton = randomNfa(5, states=20)
+    stats = algorithms.solverMinimization(automaton, 1, engine="simulation", backend="greedy")
+    assert automaton.simulationComputations <= stats.counters["families"] + 1
+
+
+@pytest.mark.parametrize("seed", range(60))
+def test_simulation_engine_preserves_language(seed):
+    automaton = randomNfa(seed)
+    original = copyNfa(automaton)
+    algorithms.solverMinimization(automaton, 1, engine="simulation", backend="greedy")
+    automaton.cleanDeadStates()
+    checkConsistency(automaton)
+    assert sameLanguage(original, automaton)
@@ -0,0 +1,60 @@
+"""test_solver.py
+Tests of the solver backends (solver.py).
+"""
+
+
+import random
+from itertools import combinations
+import pytest
+import nfa
+import reduce
+import solver
+
+
+def randomPairs(seed, states):
+    rnd = random.Random(seed)
+    pairs = [frozenset(pair) for pair in combinations(range(states), 2)]
+    return ({pair for pair in pairs if rnd.random() < 0.3},
+            {pair for pair in pairs if rnd.random() < 0.3})
+
+
+def score(backwardEq, forwardEq, result):
+    backwardTrue, forwardTrue, _ = result
+    # Each state is merged in one direction at most.
+    assert not backwardTrue & forwardTrue
+    return sum(pair <= backwardTrue for pair in backwardEq) + sum(pair <= forwardTrue for pair in forwardEq)
+
+
+def test_auto_with_z3(monkeypatch):
+    optimizer = object()
+    monkeypatch.setattr(solver, "HAS_Z3", True)
+    monkeypatch.setattr(solver, "getOptimizer", lambda: optimizer)
+    assert solver.getBackend({frozenset({1, 2})}, {frozenset({2, 3})}).name == "bruteforce"
+    assert solver.getBackend(*randomPairs(0, 20)) is optimizer
+
+
+def test_default_backend():
+    assert solver.DEFAULT_BACKEND == ("z3" if solver.HAS_Z3 else "auto")
+    assert reduce.parseArguments(["-B", "input.ba", "1"]).backend == solver.DEFAULT_BACKEND
+
+
+def test_auto_without_z3(monkeypatch):
+    monkeypatch.setattr(solver, "HAS_Z3", False)
+    assert solver.getBackend({frozenset({1, 2})}, {frozenset({2, 3})}).name == "bruteforce"
+    backwardEq = {frozenset({i, i + 1}) for i in range(0, 40, 2)}
+    forwardEq = {frozenset({i + 1, i + 2}) for i in range(0, 40, 2)}
+    assert solver.getBackend(backwardEq, forwardEq).name == "greedy"
+
+
+def test_unknown_backend():
+    with pytest.raises(nfa.BadType):
+        solver.getBackend(set(), set(), backend="unknown")
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_greedy_is_not_better_than_bruteforce(seed):
+    backwardEq, forwardEq = randomPairs(seed, 6)
+    best = score(backwardEq, forwardEq, solver.BruteForceSolver().solve(backwardEq, forwardEq))
+    assert score(backwardEq, forwardEq, solver.GreedySolver().solve(backwardEq, forwardEq)) <= best
+    if solver.HAS_Z3:
+        assert score(backwardEq, forwardEq, solver.getOptimizer().solve(backwardEq, forwardEq)) == best
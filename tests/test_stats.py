@@ -0,0 +1,121 @@
+"""test_stats.py
+Tests of the statistics of the minimization (stats.py) and their export
+by reduce.py (--stats).
+"""
+
+
+from concurrent.futures import ProcessPoolExecutor
+import json
+import sys
+import pytest
+import algorithms
+import nfa
+import reduce
+from stats import Stats
+from automata import randomNfa
+
+
+def test_phases_and_counters():
+    stats = Stats()
+    with stats.phase("first"):
+        pass
+    with pytest.raises(ValueError):
+        with stats.phase("first"):
+            raise ValueError()
+    stats.addPhase("second", 1.5, calls=3)
+    stats.count("events")
+    stats.count("events", 4)
+    # The phase is measured even if the block raised.
+    assert stats.phases["first"]["calls"] == 2 and stats.phases["first"]["seconds"] >= 0
+    assert stats.phases["second"] == {"calls": 3, "seconds": 1.5}
+    assert stats.counters["events"] == 5
+    assert stats.counters["unknown"] == 0
+
+
+def test_merge_and_to_dict():
+    stats = Stats()
+    stats.addPhase("solve", 1.0)
+    stats.count("calls", 2)
+    other = Stats()
+    other.addPhase("solve", 0.5, calls=2)
+    other.addPhase("parse", 0.25)
+    other.count("calls")
+    other.count("timeouts")
+    stats.merge(json.loads(json.dumps(other.toDict())))
+    data = stats.toDict()
+    assert data == {"phases": {"solve": {"calls": 3, "seconds": 1.5},
+                               "parse": {"calls": 1, "seconds": 0.25}},
+                    "counters": {"calls": 3, "timeouts": 1}}
+    # The exported dictionary is a copy.
+    data["phases"]["solve"]["calls"] = 0
+    assert stats.phases["solve"]["calls"] == 3
+
+
+def test_minimization_stats():
+    stats = algorithms.solverMinimization(randomNfa(7, states=30), 1)
+    assert {"getFamilies", "simplifieTransitions", "statesEQ", "calculateSolver",
+            "mergeStates"} <= set(stats.phases)
+    assert stats.counters["families"] > 0 and stats.counters["mergedGroups"] > 0
+    # Each cluster is solved once (the cache is disabled).
+    assert stats.phases["calculateSolver"]["calls"] == stats.counters["clusters"] \
+        == stats.counters["solverCalls"]
+
+
+def twoClusterAutomaton():
+    """Automaton with the family {p1, p2, p3, p4}, where p1, p2 and p3, p4
+    are equivalent (two independent clusters)."""
+    automaton = nfa.Nfa()
+    automaton.addInitialState("i")
+    for letter, states, final in (("a", ("p1", "p2"), "f1"), ("b", ("p3", "p4"), "f2")):
+        for state in states:
+            automaton.addTransition("i", state, letter)
+            automaton.addTransition(state, final, letter)
+        automaton.addAcceptingState(final)
+    return automaton
+
+
+def test_worker_stats_are_merged():
+    family = {"p1", "p2", "p3", "p4"}
+    stats = Stats()
+    algorithms.minimizeFamily(twoClusterAutomaton(), set(family), 1, stats=stats)
+    workerStats = Stats()
+    automaton = twoClusterAutomaton()
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        algorithms.minimizeFamily(automaton, set(family), 1, pool=pool, stats=workerStats)
+    assert stats.counters["clusters"] == 2
+    assert workerStats.counters == stats.counters
+    assert workerStats.phases["calculateSolver"]["calls"] == 2
+    assert len(automaton.states) == 5
+
+
+def test_stats_file(tmp_path, monkeypatch, capsys):
+    fileName = str(tmp_path / "input.ba")
+    reduce.automatonToFile(randomNfa(7, states=30), True, fileName)
+    statsName = str(tmp_path / "stats.json")
+    monkeypatch.setattr(sys, "argv", ["reduce.py", "-B", fileName, "1", "--stats", statsName])
+    reduce.main()
+    capsys.readouterr()
+    with open(statsName) as fh:
+        data = json.load(fh)
+    assert set(data) == {"phases", "counters", "parse", "cacheHitRate", "partial"}
+    assert {"parse", "cleanDeadStates", "output", "calculateSolver"} <= set(data["phases"])
+    assert {"lines", "seconds", "linesPerSecond"} == set(data["parse"])
+    assert {"eqCacheHits", "eqCacheMisses", "solverCalls"} <= set(data["counters"])
+    assert data["partial"] is False and data["cacheHitRate"] == 0.0
+
+
+def test_batch_stats_file(tmp_path, monkeypatch, capsys):
+    for seed in (4, 5):
+        reduce.automatonToFile(randomNfa(seed, states=12), True, str(tmp_path / "{0}.ba".format(seed)))
+    statsName = str(tmp_path / "stats.json")
+    monkeypatch.setattr(sys, "argv", ["reduce.py", str(tmp_path), "1", "--batch", "-j", "2",
+                                      "--stats", statsName])
+    reduce.main()
+    capsys.readouterr()
+    with open(statsName) as fh:
+        data = json.load(fh)
+    # Statistics of each file are computed in the worker process.
+    assert sorted(data) == [str(tmp_path / "4.ba"), str(tmp_path / "5.ba")]
+    for fileStats in data.values():
+        assert {"phases", "counters", "parse"} <= set(fileStats)
+        assert fileStats["phases"]["parse"]["calls"] == 1
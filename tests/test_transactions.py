@@ -0,0 +1,82 @@
+"""test_transactions.py
+Tests of the undo journal of Nfa (beginTransaction, commitTransaction,
+rollbackTransaction) and of its use by solverMinimization.
+"""
+
+
+import random
+import pytest
+import algorithms
+import nfa
+from automata import randomNfa, copyNfa, sameLanguage, checkConsistency
+
+
+def snapshot(automaton):
+    return (set(automaton.states), set(automaton.initialStates), set(automaton.acceptingStates),
+            {(fromS, toS, byL) for fromS in automaton.forwardTrans
+             for byL in automaton.forwardTrans[fromS] for toS in automaton.forwardTrans[fromS][byL]},
+            {state: (automaton.inDegree(state), automaton.outDegree(state)) for state in automaton.states})
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_rollback_restores_automaton(seed):
+    automaton = randomNfa(seed)
+    before = snapshot(automaton)
+    rnd = random.Random(seed)
+    automaton.beginTransaction()
+    for _ in range(6):
+        states = sorted(automaton.states)
+        action = rnd.randrange(4)
+        if action == 0 and states:
+            automaton.pruneState(rnd.choice(states))
+        elif action == 1 and states:
+            automaton.mergeStates(set(rnd.sample(states, min(2, len(states)))))
+        elif action == 2:
+            # New states together with their transitions.
+            newState = automaton.createNewState("tmp")
+            automaton.addTransitions([(newState, rnd.choice(states or [newState]), "a"),
+                                      ("x{0}".format(seed), newState, "b")])
+        elif states:
+            automaton.addAcceptingState(rnd.choice(states))
+    automaton.rollbackTransaction()
+
+    checkConsistency(automaton)
+    assert snapshot(automaton) == before
+    # The degrees of the removed new states are not left negative.
+    assert automaton.outDegree("x{0}".format(seed)) == 0
+
+
+def test_transaction_errors():
+    automaton = randomNfa(1)
+    with pytest.raises(nfa.TransactionError):
+        automaton.commitTransaction()
+    with pytest.raises(nfa.TransactionError):
+        automaton.rollbackTransaction()
+    automaton.beginTransaction()
+    with pytest.raises(nfa.TransactionError):
+        automaton.beginTransaction()
+    automaton.commitTransaction()
+
+
+def test_exception_rolls_back(monkeypatch):
+    # The states p and q are the family of the center i.
+    automaton = nfa.Nfa()
+    automaton.addInitialState("i")
+    automaton.addTransitions([("i", "p", "a"), ("i", "q", "a"), ("p", "f", "b"), ("q", "f", "c")])
+    automaton.addAcceptingState("f")
+    original = copyNfa(automaton)
+    before = snapshot(automaton)
+
+    def failingMinimizeFamily(*args, **kwargs):
+        raise RuntimeError("failure")
+
+    monkeypatch.setattr(algorithms, "minimizeFamily", failingMinimizeFamily)
+    with pytest.raises(RuntimeError):
+        algorithms.solverMinimization(automaton, 1)
+
+    # The journal is closed and the changes of simplifieTransitions are reverted.
+    automaton.beginTransaction()
+    automaton.commitTransaction()
+    checkConsistency(automaton)
+    assert snapshot(automaton) == before
+    assert sameLanguage(original, automaton)